@@ -0,0 +1,141 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.11"
+# dependencies = ["aiohttp", "aiohttp-socks", "dnspython", "prometheus_client"]
+# ///
+"""Proxy verification throughput against local SOCKS stand-ins.
+
+Starts a local HTTP target and a SOCKS4/5 stand-in that relays to it after
+a configurable delay, then verifies a candidate list that mixes working
+proxies with refused ports and blackholes (accepting, never answering),
+the way a downloaded free proxy list looks. Nothing leaves the box.
+
+    ./bench_proxies.py --alive 200 --refused 200 --blackhole 200
+"""
+import argparse
+import asyncio
+import ipaddress
+import os
+import socket
+import struct
+import time
+
+from aiohttp import web
+
+
+async def serve_target() -> int:
+    async def check(request):
+        return web.Response(body=b"0123456789", status=206)
+
+    app = web.Application()
+    app.router.add_get("/check", check)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner.addresses[0][1]
+
+
+async def pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while data := await reader.read(65536):
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+async def socks_handshake(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Reads a SOCKS4 or SOCKS5 CONNECT, returns (host, port, reply)"""
+    version = (await reader.readexactly(1))[0]
+    if version == 4:
+        _, port = struct.unpack("!BH", await reader.readexactly(3))
+        host = str(ipaddress.IPv4Address(await reader.readexactly(4)))
+        await reader.readuntil(b"\0")  # user id
+        return host, port, b"\0\x5a" + b"\0" * 6
+    methods = await reader.readexactly((await reader.readexactly(1))[0])
+    if 2 in methods:
+        writer.write(b"\x05\x02")
+        await reader.readexactly(1)
+        await reader.readexactly((await reader.readexactly(1))[0])
+        await reader.readexactly((await reader.readexactly(1))[0])
+        writer.write(b"\x01\x00")
+    else:
+        writer.write(b"\x05\x00")
+    _, _, _, kind = await reader.readexactly(4)
+    if kind == 1:
+        host = str(ipaddress.IPv4Address(await reader.readexactly(4)))
+    elif kind == 3:
+        host = (await reader.readexactly((await reader.readexactly(1))[0])).decode()
+    else:
+        host = str(ipaddress.IPv6Address(await reader.readexactly(16)))
+    (port,) = struct.unpack("!H", await reader.readexactly(2))
+    return host, port, b"\x05\x00\x00\x01" + b"\0" * 6
+
+
+async def serve_socks(delay: float) -> int:
+    """SOCKS stand-in, every handshake reply and response comes `delay` late"""
+
+    async def handle(reader, writer):
+        try:
+            host, port, reply = await socks_handshake(reader, writer)
+            await asyncio.sleep(delay)
+            upstream_reader, upstream_writer = await asyncio.open_connection(host, port)
+            writer.write(reply)
+            await asyncio.gather(pipe(reader, upstream_writer), pipe(upstream_reader, writer))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0, backlog=4096)
+    return server.sockets[0].getsockname()[1]
+
+
+async def serve_blackhole() -> int:
+    """Accepts connections and never answers, like a proxy that died behind a load balancer"""
+    held = []
+
+    async def handle(reader, writer):
+        held.append(writer)
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0, backlog=4096)
+    return server.sockets[0].getsockname()[1]
+
+
+def refused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def main(args):
+    target = await serve_target()
+    os.environ["URL_CHECK"] = f"http://127.0.0.1:{target}/check"
+    # read at import, after URL_CHECK points at the local target
+    import proxy_catcher
+
+    alive = await serve_socks(args.delay)
+    blackhole = await serve_blackhole()
+    refused = refused_port()
+    candidates = (
+        [f"socks5://127.0.0.1:{alive}"] * (args.alive // 2)
+        + [f"socks4://127.0.0.1:{alive}"] * (args.alive - args.alive // 2)
+        + [f"socks5://127.0.0.1:{refused}"] * args.refused
+        + [f"socks5://127.0.0.1:{blackhole}"] * args.blackhole
+    )
+    started = time.monotonic()
+    working = await proxy_catcher.filter_working_proxies(candidates)
+    elapsed = time.monotonic() - started
+    print(
+        f"{len(candidates)} checks in {elapsed:.1f}s, {len(candidates) / elapsed:.1f} checks/s, "
+        f"{len(working)}/{args.alive} working found"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alive", type=int, default=200)
+    parser.add_argument("--refused", type=int, default=200)
+    parser.add_argument("--blackhole", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds the stand-in adds")
+    asyncio.run(main(parser.parse_args()))
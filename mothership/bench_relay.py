@@ -0,0 +1,430 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.11"
+# dependencies = ["prometheus_client", "websockets", "loguru", "protobuf==5.29.4"]
+# ///
+"""Micro-benchmarks for the relay hot path.
+
+Every stage a datagram goes through is timed on its own with a realistic mix
+of Binance and Upbit titles, followed by the whole decode + forward path
+against a local WebSocket sink. Nothing leaves the box.
+
+    ./bench_relay.py --json before.json
+    ./bench_relay.py --compare before.json
+    ./bench_relay.py --tokens
+    ./bench_relay.py --logging
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict
+from typing import Callable, Dict, List
+
+import websockets
+from loguru import logger
+
+import hotlog
+import relay
+from filters import sign
+from samples import ALL_ANNOUNCES, TOKEN_TITLES, UPBIT_ANNOUNCES, make_announcement
+
+ADDR = ("127.0.0.1", 40000)
+
+
+def bench(fn: Callable[[int], object], iterations: int, repeat: int) -> float:
+    """Median ns/op over `repeat` runs of `iterations` calls"""
+    for i in range(min(iterations, 1000)):  # warmup
+        fn(i)
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        for i in range(iterations):
+            fn(i)
+        runs.append((time.perf_counter_ns() - started) / iterations)
+    return statistics.median(runs)
+
+
+async def bench_async(fn, iterations: int, repeat: int) -> float:
+    for i in range(min(iterations, 1000)):
+        await fn(i)
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        for i in range(iterations):
+            await fn(i)
+        runs.append((time.perf_counter_ns() - started) / iterations)
+    return statistics.median(runs)
+
+
+def allocated_per_op(fn: Callable[[int], object], iterations: int = 500) -> float:
+    """Average peak of bytes allocated while a single call is running"""
+    tracemalloc.start()
+    total = 0
+    for i in range(iterations):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn(i)
+        total += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return total / iterations
+
+
+def unique_datagrams(count: int) -> List[bytes]:
+    """Distinct, fresh datagrams, so neither dedup nor the staleness check kicks in"""
+    # fresh for the whole run, inside FILTER_TS_FUTURE_MS
+    ts = int(time.time()) + 600
+    return [
+        make_announcement(catalog, f"{title} #{i}", cta, ts=ts).SerializeToString()
+        for i, (catalog, title, cta) in (
+            (i, ALL_ANNOUNCES[i % len(ALL_ANNOUNCES)]) for i in range(count)
+        )
+    ]
+
+
+def stage_functions() -> Dict[str, Callable[[int], object]]:
+    messages = [make_announcement(*announce) for announce in ALL_ANNOUNCES]
+    datagrams = [message.SerializeToString() for message in messages]
+    upbit_titles = [title for _, title, _ in UPBIT_ANNOUNCES]
+    token_titles = [title for title, _ in TOKEN_TITLES]
+    forwards = [
+        relay.NewAnnounces(
+            "bombardino coccodrillo",
+            [
+                relay.PageEntry(
+                    title=message.title,
+                    ts=message.ts,
+                    tokens=set(message.tokens),
+                    catalog_id=message.catalog,
+                    cex=relay.PageEntryCEX.BINANCE.value,
+                )
+            ],
+        )
+        for message in messages
+    ]
+
+    def parse(i):
+        relay.Announcement().ParseFromString(datagrams[i % len(datagrams)])
+
+    def upbit_tokens(i):
+        relay.symbol_dictionary.tokens(upbit_titles[i % len(upbit_titles)])
+
+    def tokens_regex(i):
+        relay.parse_upbit_listing_tokens(token_titles[i % len(token_titles)])
+
+    def tokens_automaton(i):
+        relay.symbol_dictionary.match(token_titles[i % len(token_titles)])
+
+    datagram_filter = relay.DatagramFilter("bench-key", rate=1e9, burst=1e9)
+    signed = [sign(datagram, b"bench-key") for datagram in datagrams]
+    signed_messages = [relay.Announcement.FromString(data) for data in signed]
+    now_ms = int(time.time() * 1000)
+
+    def admit(i):
+        data = signed[i % len(signed)]
+        datagram_filter.reject_reason(data, ADDR[0])
+        datagram_filter.reject_message_reason(data, signed_messages[i % len(signed)], ADDR[0], now_ms)
+
+    def fingerprint(i):
+        relay.announce_fingerprint(messages[i % len(messages)])
+
+    def build(i):
+        message = messages[i % len(messages)]
+        relay.NewAnnounces(
+            "bombardino coccodrillo",
+            [
+                relay.PageEntry(
+                    title=message.title,
+                    ts=message.ts,
+                    tokens=set(message.tokens),
+                    catalog_id=message.catalog,
+                    cex=relay.PageEntryCEX.BINANCE.value,
+                )
+            ],
+        )
+
+    def encode(i):
+        forwards[i % len(forwards)].to_json_str()
+
+    def encode_asdict(i):
+        relay.BaseMessage.to_json_str(forwards[i % len(forwards)])
+
+    def encode_binary(i):
+        forwards[i % len(forwards)].to_proto_bytes()
+
+    trace = relay.Trace("0" * 32, *[time.time_ns()] * 4)
+
+    def encode_traced(i):
+        forwards[i % len(forwards)].to_json_str(trace)
+
+    json_frames = [forward.to_json_str() for forward in forwards]
+    binary_frames = [forward.to_proto_bytes() for forward in forwards]
+
+    def decode_json(i):
+        json.loads(json_frames[i % len(json_frames)])
+
+    def decode_binary(i):
+        relay.relay_pb2.NewAnnounces.FromString(binary_frames[i % len(binary_frames)])
+
+    def log_format(i):
+        _ = f"Received {forwards[i % len(forwards)]} from {ADDR}. Time difference: {i}ms"
+
+    return {
+        "parse": parse,
+        "upbit_tokens": upbit_tokens,
+        "tokens_regex": tokens_regex,
+        "tokens_automaton": tokens_automaton,
+        "admit": admit,
+        "fingerprint": fingerprint,
+        "build": build,
+        "encode": encode,
+        "encode_asdict": encode_asdict,
+        "encode_binary": encode_binary,
+        "encode_traced": encode_traced,
+        "decode_json": decode_json,
+        "decode_binary": decode_binary,
+        "log_format": log_format,
+    }
+
+
+def check_compatibility() -> int:
+    """Compares the template serializer with json.dumps(asdict()) for every sample"""
+    mismatches = 0
+    titles = ALL_ANNOUNCES + [(48, 'Binance Will List "Quoted" Ünïcode USDⓈ (QTE)', True)]
+    for catalog, title, cta in titles:
+        message = make_announcement(catalog, title, cta)
+        for dry_run in (False, True):
+            for tokens in (set(message.tokens), relay.parse_upbit_listing_tokens(title), set()):
+                forward = relay.NewAnnounces(
+                    "bombardino coccodrillo",
+                    [
+                        relay.PageEntry(
+                            title=message.title,
+                            ts=message.ts,
+                            tokens=tokens,
+                            catalog_id=message.catalog,
+                            cex=relay.PageEntryCEX.UPBIT.value,
+                        )
+                    ],
+                    dry_run=dry_run,
+                )
+                fast = forward.to_json_str()
+                reference = relay.BaseMessage.to_json_str(forward)
+                if fast != reference:
+                    mismatches += 1
+                    print(f"MISMATCH\n  fast      {fast}\n  reference {reference}")
+                trace = relay.Trace(message.title[:8], 1, 2, 3, 4)
+                traced = json.loads(forward.to_json_str(trace))
+                if traced.pop("trace") != asdict(trace) or traced != json.loads(reference):
+                    mismatches += 1
+                    print(f"MISMATCH traced {forward.to_json_str(trace)}")
+    return mismatches
+
+
+def compare_tokens():
+    """Precision and recall of both token extractors on the labelled titles"""
+    extractors = {
+        "regex": relay.parse_upbit_listing_tokens,
+        "dictionary": relay.symbol_dictionary.match,
+    }
+    print(f"{'extractor':<12}{'exact':>8}{'precision':>11}{'recall':>8}")
+    for name, extract in extractors.items():
+        exact = found = correct = expected = 0
+        for title, truth in TOKEN_TITLES:
+            tokens = set(extract(title))
+            exact += tokens == truth
+            found += len(tokens)
+            correct += len(tokens & truth)
+            expected += len(truth)
+            if tokens != truth:
+                print(f"  {name}: {title[:60]!r} -> {sorted(tokens)}, expected {sorted(truth)}")
+        print(
+            f"{name:<12}{exact:>4}/{len(TOKEN_TITLES):<3}{correct / found:>11.2f}{correct / expected:>8.2f}"
+        )
+
+
+async def measure_loop_stalls(datagrams: List[bytes], rate: int, batch: int = 20) -> List[float]:
+    """Feeds datagrams in batches at `rate` while a 1ms sleeper records how late it wakes"""
+    loop = asyncio.get_running_loop()
+    stalls = []
+
+    async def watch():
+        while True:
+            started = loop.time()
+            await asyncio.sleep(0.001)
+            stalls.append(loop.time() - started - 0.001)
+
+    watcher = asyncio.create_task(watch())
+    for start in range(0, len(datagrams), batch):
+        for data in datagrams[start : start + batch]:
+            relay.handle_datagram(data, ADDR)
+        await asyncio.sleep(batch / rate)
+    watcher.cancel()
+    return stalls
+
+
+def compare_logging(rate: int = 2000, seconds: float = 3):
+    """Loop stalls with hot path logging off, synchronous and through the async sink"""
+    relay.datagram_filter = relay.DatagramFilter(rate=0)
+    modes = {"off": ("WARNING", False), "sync": ("DEBUG", False), "async": ("DEBUG", True)}
+    print(f"{'logging':<8}{'p50 ms':>9}{'p99 ms':>9}{'p999 ms':>9}{'max ms':>9}{'lines':>8}")
+    for mode, (level, enabled) in modes.items():
+        relay.dedup_cache = relay.DedupCache()
+        datagrams = unique_datagrams(int(rate * seconds))
+        with tempfile.NamedTemporaryFile("w+") as f:
+            logger.remove()
+            logger.add(f, level=level)
+            hotlog.sink.enabled = enabled
+            stalls = sorted(asyncio.run(measure_loop_stalls(datagrams, rate)))
+            hotlog.sink.drain()
+            logger.remove()
+            f.seek(0)
+            lines = sum(1 for _ in f)
+        quantiles = [stalls[min(len(stalls) - 1, int(q * len(stalls)))] * 1000 for q in (0.5, 0.99, 0.999)]
+        print(
+            f"{mode:<8}{quantiles[0]:>9.3f}{quantiles[1]:>9.3f}{quantiles[2]:>9.3f}"
+            f"{stalls[-1] * 1000:>9.3f}{lines:>8}"
+        )
+    logger.add(sys.stderr)
+    hotlog.sink.enabled = hotlog.LOG_ASYNC
+
+
+async def serve_sink(received: List[int]):
+    """echo_ws.py style sink which only counts frames"""
+
+    async def sink(websocket):
+        async for _ in websocket:
+            received[0] += 1
+
+    return await websockets.serve(sink, "127.0.0.1", 0, compression=None)
+
+
+async def bench_forward(iterations: int, repeat: int) -> Dict[str, float]:
+    received = [0]
+    server = await serve_sink(received)
+    port = server.sockets[0].getsockname()[1]
+    uplink = relay.Uplink(f"ws://127.0.0.1:{port}", pool_size=1)
+    uplink.start()
+    await uplink.ready.wait()
+    datagrams = iter(unique_datagrams(2 * (1000 + iterations * repeat) + 500))
+    sent = [0]
+
+    async def forward(_):
+        forward = relay.handle_datagram(next(datagrams), ADDR)
+        if forward is not None and await uplink.send(forward.encode()):
+            sent[0] += 1
+
+    def handle(_):
+        relay.handle_datagram(next(datagrams), ADDR)
+
+    results = {}
+    # every datagram comes from ADDR, the rate limit would reject most of them
+    relay.datagram_filter = relay.DatagramFilter(rate=0)
+    relay.dedup_cache = relay.DedupCache()
+    results["handle_datagram"] = bench(handle, iterations, repeat)
+    results["handle_datagram_bytes"] = allocated_per_op(handle)
+    relay.dedup_cache = relay.DedupCache()
+    results["forward"] = await bench_async(forward, iterations, repeat)
+    # let the sink catch up so the connection is closed with nothing in flight
+    while received[0] < sent[0] and uplink.connections:
+        await asyncio.sleep(0.01)
+    await uplink.close()
+    server.close()
+    await server.wait_closed()
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(iterations: int, repeat: int) -> dict:
+    # keep loguru formatting in the measurement but drop the output
+    logger.remove()
+    logger.add(lambda _: None, level="DEBUG")
+    stages = {}
+    for name, fn in stage_functions().items():
+        stages[name] = {
+            "ns_per_op": bench(fn, iterations, repeat),
+            "bytes_per_op": allocated_per_op(fn),
+        }
+    forward = asyncio.run(bench_forward(iterations, repeat))
+    stages["handle_datagram"] = {
+        "ns_per_op": forward["handle_datagram"],
+        "bytes_per_op": forward["handle_datagram_bytes"],
+    }
+    stages["forward"] = {"ns_per_op": forward["forward"], "bytes_per_op": None}
+    return {
+        "revision": git_revision(),
+        "python": f"{platform.python_implementation()} {platform.python_version()}",
+        "iterations": iterations,
+        "stages": stages,
+    }
+
+
+def report(result: dict, baseline: dict = None):
+    print(f"revision {result['revision']}, {result['python']}, {result['iterations']} ops")
+    header = f"{'stage':<18}{'ns/op':>12}{'B/op':>10}"
+    if baseline:
+        header += f"{'base ns/op':>14}{'change':>9}"
+    print(header)
+    for name, stage in result["stages"].items():
+        allocated = stage["bytes_per_op"]
+        line = f"{name:<18}{stage['ns_per_op']:>12.0f}"
+        line += f"{allocated:>10.0f}" if allocated is not None else f"{'-':>10}"
+        base = (baseline or {}).get("stages", {}).get(name)
+        if base:
+            change = (stage["ns_per_op"] / base["ns_per_op"] - 1) * 100
+            line += f"{base['ns_per_op']:>14.0f}{change:>+8.1f}%"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="save results to this file")
+    parser.add_argument("--compare", help="results file of a previous run")
+    parser.add_argument(
+        "--check", action="store_true", help="only verify serializer compatibility"
+    )
+    parser.add_argument(
+        "--tokens", action="store_true", help="only compare token extractor accuracy"
+    )
+    parser.add_argument(
+        "--logging", action="store_true", help="only compare loop stalls by logging mode"
+    )
+    args = parser.parse_args()
+
+    if check_compatibility():
+        raise SystemExit("NewAnnounces.to_json_str differs from json.dumps(asdict())")
+    if args.tokens:
+        compare_tokens()
+        raise SystemExit(0)
+    if args.logging:
+        compare_logging()
+        raise SystemExit(0)
+    if args.check:
+        print("serializer output is byte-identical to json.dumps(asdict())")
+        raise SystemExit(0)
+
+    result = run(args.iterations, args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(result, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
@@ -0,0 +1,224 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import websockets
+from loguru import logger
+from prometheus_client import Counter, Gauge, Histogram
+
+BROADCAST_HOST = os.environ.get("BROADCAST_HOST", "0.0.0.0")
+# > 0 makes the relay serve subscribers on this port instead of connecting upstream
+BROADCAST_PORT = int(os.environ.get("BROADCAST_PORT", 0))
+BROADCAST_QUEUE_SIZE = int(os.environ.get("BROADCAST_QUEUE_SIZE", 64))
+# comma separated ?name= values with their own metric labels, anyone else is "other"
+BROADCAST_NAMES = frozenset(
+    name.strip() for name in os.environ.get("BROADCAST_NAMES", "").split(",") if name.strip()
+)
+OTHER_SUBSCRIBERS = "other"
+
+BROADCAST_SUBSCRIBERS = Gauge("relay_broadcast_subscribers", "Connected broadcast subscribers")
+BROADCAST_SEND_TIME = Histogram(
+    "relay_broadcast_send_seconds",
+    "Time from broadcast until the frame was written to a subscriber",
+    ["subscriber"],
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.1, 0.5, 1),
+)
+BROADCAST_DROPPED = Counter(
+    "relay_broadcast_dropped_total",
+    "Frames dropped for a subscriber which fell BROADCAST_QUEUE_SIZE frames behind",
+    ["subscriber"],
+)
+
+
+class Subscriber:
+    """One connected bot with its own queue and writer task.
+
+    A subscriber that reads slowly only fills its own queue. Once that is
+    full the oldest frame is dropped, a stale announce is worth less than
+    the one behind it.
+    """
+
+    def __init__(
+        self,
+        websocket,
+        name: str,
+        label: str,
+        binary: bool = False,
+        queue_size: int = BROADCAST_QUEUE_SIZE,
+    ):
+        self.websocket = websocket
+        self.name = name
+        self.label = label
+        # negotiated the binary subprotocol, otherwise gets JSON text frames
+        self.binary = binary
+        # (frame, broadcast at perf_counter ns)
+        self.queue: Deque[Tuple[bytes, int]] = deque()
+        self.queue_size = queue_size
+        self.not_empty = asyncio.Event()
+        self.send_time = BROADCAST_SEND_TIME.labels(label)
+        self.dropped = BROADCAST_DROPPED.labels(label)
+
+    def offer(self, frame: bytes, broadcast_ns: int):
+        if len(self.queue) >= self.queue_size:
+            self.queue.popleft()
+            self.dropped.inc()
+        self.queue.append((frame, broadcast_ns))
+        self.not_empty.set()
+
+    async def write(self):
+        text = not self.binary
+        while True:
+            while not self.queue:
+                self.not_empty.clear()
+                await self.not_empty.wait()
+            frame, broadcast_ns = self.queue.popleft()
+            try:
+                await self.websocket.send(frame, text=text)
+            except websockets.ConnectionClosed:
+                return
+            self.send_time.observe((time.perf_counter_ns() - broadcast_ns) / 1e9)
+
+
+class BroadcastServer:
+    """WebSocket endpoint every announce is broadcast to.
+
+    Drop-in for Uplink in the forward stage: send() takes a frame in the
+    framing of the first offered subprotocol, converts it at most once for
+    subscribers which negotiated the other one and hands it to the queue of
+    every subscriber without waiting for any of them. Clients offering no
+    subprotocol get JSON. Subscribers may name themselves with ?name=, names
+    in BROADCAST_NAMES label their metrics, everyone else shares "other".
+    """
+
+    def __init__(
+        self,
+        host: str = BROADCAST_HOST,
+        port: int = BROADCAST_PORT,
+        subprotocols: Optional[list] = None,
+        binary_subprotocol: Optional[str] = None,
+        reframe: Optional[Callable] = None,
+        names: frozenset = BROADCAST_NAMES,
+    ):
+        self.host = host
+        self.port = port
+        self.subprotocols = subprotocols
+        # framing of the frames send() gets
+        self.subprotocol: Optional[str] = subprotocols[0] if subprotocols else None
+        self.binary_subprotocol = binary_subprotocol
+        # converts a JSON frame to a binary one and back
+        self.reframe = reframe
+        self.names = names
+        # metric label -> connected subscribers, series go with the last one
+        self.labels: Dict[str, int] = {}
+        self.pool_size = 1
+        self.subscribers: Set[Subscriber] = set()
+        self.ready = asyncio.Event()
+        self.last_send_ms = 0.0
+        self.on_connect: Optional[Callable[[], Awaitable]] = None
+        self.callbacks: Set[asyncio.Task] = set()
+        self.server = None
+        self.tasks = []
+
+    def start(self):
+        self.tasks.append(asyncio.create_task(self.serve_forever()))
+
+    async def serve_forever(self):
+        self.server = await websockets.serve(
+            self.serve,
+            self.host,
+            self.port,
+            compression=None,
+            subprotocols=self.subprotocols,
+            select_subprotocol=self.select_subprotocol,
+            ping_interval=5,
+            ping_timeout=5,
+        )
+        logger.info(f"Broadcasting announces on ws://{self.host}:{self.port}")
+        await self.server.wait_closed()
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def select_subprotocol(self, connection, offered):
+        """First of ours the client offered, None (JSON) instead of a 400 when it offered none"""
+        for subprotocol in self.subprotocols or ():
+            if subprotocol in offered:
+                return subprotocol
+        return None
+
+    async def serve(self, websocket):
+        query = parse_qs(urlsplit(websocket.request.path).query)
+        name = query.get("name", [websocket.remote_address[0]])[0][:64]
+        label = name if name in self.names else OTHER_SUBSCRIBERS
+        binary = (
+            self.binary_subprotocol is not None and websocket.subprotocol == self.binary_subprotocol
+        )
+        subscriber = Subscriber(websocket, name, label, binary)
+        self.labels[label] = self.labels.get(label, 0) + 1
+        writer = asyncio.create_task(subscriber.write())
+        self.subscribers.add(subscriber)
+        BROADCAST_SUBSCRIBERS.set(len(self.subscribers))
+        self.ready.set()
+        logger.info(
+            f"Subscriber {name} connected from {websocket.remote_address}, subprotocol {websocket.subprotocol}"
+        )
+        if self.on_connect:
+            callback = asyncio.create_task(self.on_connect())
+            self.callbacks.add(callback)
+            callback.add_done_callback(self.callbacks.discard)
+        # nothing is expected from subscribers, reading keeps pings answered
+        reader = asyncio.create_task(self.drain(websocket))
+        try:
+            await asyncio.wait([writer, reader], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            writer.cancel()
+            reader.cancel()
+            self.subscribers.discard(subscriber)
+            BROADCAST_SUBSCRIBERS.set(len(self.subscribers))
+            self.labels[label] -= 1
+            if not self.labels[label]:
+                del self.labels[label]
+                BROADCAST_SEND_TIME.remove(label)
+                BROADCAST_DROPPED.remove(label)
+            if not self.subscribers:
+                self.ready.clear()
+            logger.info(
+                f"Subscriber {name} disconnected, {len(subscriber.queue)} frames unsent"
+            )
+
+    @staticmethod
+    async def drain(websocket):
+        try:
+            async for _ in websocket:
+                pass
+        except websockets.ConnectionClosed:
+            pass
+
+    async def send(self, frame) -> bool:
+        """Queues the frame for every subscriber, returns False if there is none"""
+        if not self.subscribers:
+            return False
+        started = time.perf_counter_ns()
+        # binary -> payload, each framing is encoded once for all its subscribers
+        payloads: Dict[bool, bytes] = {}
+        for subscriber in self.subscribers:
+            payload = payloads.get(subscriber.binary)
+            if payload is None:
+                payload = payloads[subscriber.binary] = self.encode(frame, subscriber.binary)
+            subscriber.offer(payload, started)
+        self.last_send_ms = (time.perf_counter_ns() - started) / 1e6
+        # nothing above awaits, without a yield a burst starves the writers
+        await asyncio.sleep(0)
+        return True
+
+    def encode(self, frame, binary: bool) -> bytes:
+        if isinstance(frame, bytes) != binary:
+            frame = self.reframe(frame)
+        return frame.encode() if isinstance(frame, str) else frame
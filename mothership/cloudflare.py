@@ -7,6 +7,8 @@ import cloudscraper
 from aiohttp import web, ClientTimeout
 from loguru import logger
 
+from hotlog import LogSite
+
 PORT = int(os.environ.get("PORT", 8880))
 EXIT_ON_ERR = os.environ.get("EXIT_ON_ERR", "False").lower() in ("true", "1", "t")
 PROXY_GET_URL = os.environ.get("PROXY_GET_URL", "http://127.0.0.1:8881/random-proxies")
@@ -22,6 +24,9 @@ success_req_count = 0
 
 lock = asyncio.Lock()
 
+# every failing proxy request logs, sampled and written off the loop with LOG_ASYNC=1
+log_request_error = LogSite("cf_request_error", "WARNING")
+
 
 async def cloudflare_scrape(request):
     global scrapers
@@ -39,7 +44,7 @@ async def cloudflare_scrape(request):
     try:
         response = await asyncio.to_thread(scraper.get, url, timeout=3, headers=headers)
     except Exception as ex:
-        logger.warning(f"CF request err {ex}")
+        log_request_error("CF request err {}", ex)
         await register_err(scraper)
         return web.Response(text="Async err", content_type="text", status=500)
     body = response.text
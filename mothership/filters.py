@@ -0,0 +1,149 @@
+import hashlib
+import hmac
+import os
+import time
+from typing import Dict, List, Optional
+
+from loguru import logger
+from prometheus_client import Counter
+
+FILTER_MIN_SIZE = int(os.environ.get("FILTER_MIN_SIZE", 16))
+# killer-whale asserts < 1300 bytes, a datagram filling the receive buffer was truncated
+FILTER_MAX_SIZE = int(os.environ.get("FILTER_MAX_SIZE", 1299))
+# datagrams per second and burst per source address, 0 disables the limit
+FILTER_RATE = float(os.environ.get("FILTER_RATE", 200))
+FILTER_BURST = float(os.environ.get("FILTER_BURST", 400))
+FILTER_SOURCES = int(os.environ.get("FILTER_SOURCES", 4096))
+# far outside STALE_AFTER_MS, only junk and replays are rejected this early
+FILTER_TS_PAST_MS = int(os.environ.get("FILTER_TS_PAST_MS", 300_000))
+FILTER_TS_FUTURE_MS = int(os.environ.get("FILTER_TS_FUTURE_MS", 900_000))
+FILTER_MAX_TITLE = int(os.environ.get("FILTER_MAX_TITLE", 1024))
+FILTER_MAX_TOKENS = int(os.environ.get("FILTER_MAX_TOKENS", 32))
+# comma separated HMAC keys, more than one while rotating, empty accepts unsigned datagrams
+FILTER_SIGNING_KEYS = os.environ.get("FILTER_SIGNING_KEYS", "")
+FILTER_ALLOW_UNSIGNED = int(os.environ.get("FILTER_ALLOW_UNSIGNED", 0)) > 0
+
+# Announcement.signature (field 6, 32 bytes) encoded as the last field of the datagram
+SIGNATURE_TAG = b"\x32\x20"
+SIGNATURE_SIZE = len(SIGNATURE_TAG) + hashlib.sha256().digest_size
+
+FILTER_REJECTED = Counter(
+    "relay_datagrams_rejected_total", "Datagrams rejected before processing, by reason", ["reason"]
+)
+
+
+def sign(data: bytes, key: bytes) -> bytes:
+    """Appends the signature field to a serialized Announcement without one"""
+    return data + SIGNATURE_TAG + hmac.new(key, data, hashlib.sha256).digest()
+
+
+class DatagramFilter:
+    """Cheapest first checks every datagram passes before it is processed.
+
+    reject_reason() runs on the raw bytes: size, so the protobuf parser only
+    sees bounded datagrams. reject_message_reason() runs right after
+    parsing: the HMAC signature, required fields, bounds and a wide
+    timestamp window. The signature is taken from the parsed message, the
+    tag bytes alone can just as well be text of the title. The per source
+    rate limit is charged right after the size check, or with signing keys
+    only once the signature verified: source addresses are easily spoofed
+    and junk sent under a poller's address must not use up its budget.
+    Both return why the datagram is rejected, None when it passes.
+    Rejections are only counted, a flood must not turn into a log flood.
+    """
+
+    def __init__(
+        self,
+        signing_keys: str = FILTER_SIGNING_KEYS,
+        rate: float = FILTER_RATE,
+        burst: float = FILTER_BURST,
+        max_sources: int = FILTER_SOURCES,
+    ):
+        # keyed hashes with the key already mixed in, copy() skips the key schedule
+        self.keys: List[hmac.HMAC] = [
+            hmac.new(key.strip().encode(), digestmod=hashlib.sha256)
+            for key in signing_keys.split(",")
+            if key.strip()
+        ]
+        self.rate_per_ns = rate / 1e9
+        self.burst = burst
+        self.max_sources = max_sources
+        # source -> [tokens, refilled at ns], insertion ordered for eviction
+        self.buckets: Dict[str, List[float]] = {}
+        self.rejected = {
+            reason: FILTER_REJECTED.labels(reason)
+            for reason in (
+                "size",
+                "rate_limited",
+                "unsigned",
+                "bad_signature",
+                "shape",
+                "ts_window",
+            )
+        }
+
+    def reject(self, reason: str) -> str:
+        self.rejected[reason].inc()
+        return reason
+
+    def reject_reason(self, data: bytes, source: str) -> Optional[str]:
+        size = len(data)
+        if size < FILTER_MIN_SIZE or size > FILTER_MAX_SIZE:
+            return self.reject("size")
+        if not self.keys and self.rate_per_ns and not self.take(source, time.monotonic_ns()):
+            return self.reject("rate_limited")
+        return None
+
+    def take(self, source: str, now_ns: int) -> bool:
+        """Takes a token of the source's bucket, `now_ns` is monotonic"""
+        bucket = self.buckets.get(source)
+        if bucket is None:
+            if len(self.buckets) >= self.max_sources:
+                # spoofed sources must not grow the table, the oldest bucket goes
+                del self.buckets[next(iter(self.buckets))]
+            bucket = self.buckets[source] = [self.burst, now_ns]
+        tokens = min(self.burst, bucket[0] + (now_ns - bucket[1]) * self.rate_per_ns)
+        bucket[1] = now_ns
+        if tokens < 1:
+            if bucket[0] >= 1:
+                logger.warning(f"Rate limiting datagrams from {source}")
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+    def verify(self, data: bytes, message) -> Optional[str]:
+        signature = message.signature
+        if not signature:
+            return None if FILTER_ALLOW_UNSIGNED else self.reject("unsigned")
+        # sign() appends the field, what precedes its last occurrence was signed
+        if len(signature) != SIGNATURE_SIZE - len(SIGNATURE_TAG) or not data.endswith(
+            SIGNATURE_TAG + signature
+        ):
+            return self.reject("bad_signature")
+        signed = data[:-SIGNATURE_SIZE]
+        for key in self.keys:
+            mac = key.copy()
+            mac.update(signed)
+            if hmac.compare_digest(mac.digest(), signature):
+                return None
+        return self.reject("bad_signature")
+
+    def reject_message_reason(self, data: bytes, message, source: str, now_ms: int) -> Optional[str]:
+        if self.keys:
+            reason = self.verify(data, message)
+            if reason is not None:
+                return reason
+            if self.rate_per_ns and not self.take(source, time.monotonic_ns()):
+                return self.reject("rate_limited")
+        if (
+            not message.catalog
+            or not message.title
+            or len(message.title) > FILTER_MAX_TITLE
+            or len(message.tokens) > FILTER_MAX_TOKENS
+        ):
+            return self.reject("shape")
+        ts_ms = message.ts * 1000
+        if ts_ms < now_ms - FILTER_TS_PAST_MS or ts_ms > now_ms + FILTER_TS_FUTURE_MS:
+            return self.reject("ts_window")
+        return None
@@ -0,0 +1,183 @@
+import asyncio
+import atexit
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from loguru import logger
+from prometheus_client import Counter, Histogram
+
+# hands hot path records to a background thread instead of formatting them on the loop
+LOG_ASYNC = int(os.environ.get("LOG_ASYNC", 0)) > 0
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10_000))
+LOG_FLUSH_INTERVAL = float(os.environ.get("LOG_FLUSH_INTERVAL", 0.05))
+LOG_DRAIN_CHUNK = 16
+# records per second and burst per call site in async mode, 0 logs everything
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", 20))
+LOG_SAMPLE_BURST = float(os.environ.get("LOG_SAMPLE_BURST", 50))
+LOOP_STALL_INTERVAL = float(os.environ.get("LOOP_STALL_INTERVAL", 0.01))
+
+LOG_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Hot path log records not written, by call site and reason (sampled, queue_full)",
+    ["site", "reason"],
+)
+LOOP_STALL = Histogram(
+    "event_loop_stall_seconds",
+    "How much later than scheduled the event loop woke up a sleeping task",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1),
+)
+
+# (unix ns, site, message, args, records suppressed before this one)
+Record = Tuple[int, "LogSite", str, tuple, int]
+
+
+class AsyncLogSink:
+    """Background thread writing queued records through loguru.
+
+    Appending to a deque is atomic, the hot path neither takes a lock nor
+    wakes the thread; it drains every LOG_FLUSH_INTERVAL. Records keep the
+    time and call site they were logged at.
+    """
+
+    def __init__(self, enabled: bool = LOG_ASYNC, queue_size: int = LOG_QUEUE_SIZE):
+        self.enabled = enabled
+        self.queue_size = queue_size
+        self.records: Deque[Record] = deque()
+        self.thread: Optional[threading.Thread] = None
+        self.current: Optional[Record] = None
+        self.logger = logger.patch(self.patch)
+        self.lock = threading.Lock()
+        atexit.register(self.drain)
+        # forked relay workers start their own thread
+        os.register_at_fork(after_in_child=self.forked)
+
+    def forked(self):
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def put(self, record: Record) -> bool:
+        if len(self.records) >= self.queue_size:
+            return False
+        self.records.append(record)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="hotlog", daemon=True)
+            self.thread.start()
+        return True
+
+    def run(self):
+        while True:
+            time.sleep(LOG_FLUSH_INTERVAL)
+            self.drain()
+
+    def drain(self):
+        with self.lock:
+            written = 0
+            while self.records:
+                written += 1
+                if written % LOG_DRAIN_CHUNK == 0:
+                    # hand the GIL back, otherwise the loop waits out the 5ms switch interval
+                    time.sleep(0)
+                self.current = record = self.records.popleft()
+                _, site, message, args, suppressed = record
+                if suppressed:
+                    message = f"{message} ({suppressed} similar suppressed)"
+                try:
+                    self.logger.log(site.level, message, *args)
+                except Exception:
+                    logger.exception(f"Failed to write a {site.name} record")
+            self.current = None
+
+    def patch(self, record):
+        if self.current is None:
+            return
+        logged_ns, site, _, _, _ = self.current
+        logged_at = type(record["time"]).fromtimestamp(logged_ns / 1e9, tz=record["time"].tzinfo)
+        record["time"] = logged_at
+        record["name"], record["function"], record["line"] = site.module, site.function, site.line
+
+
+sink = AsyncLogSink()
+
+
+class LogSite:
+    """One hot path log call.
+
+    Takes a str.format() message and its arguments, which are only
+    formatted if the record is written. Without LOG_ASYNC it logs through
+    loguru right away, as before. With it the record is sampled, at most
+    LOG_SAMPLE_RATE per second after a burst of LOG_SAMPLE_BURST, and queued
+    for the sink thread, so arguments must not be mutated afterwards.
+    """
+
+    __slots__ = (
+        "name",
+        "level",
+        "logger",
+        "rate_per_ns",
+        "burst",
+        "tokens",
+        "refilled_ns",
+        "suppressed",
+        "module",
+        "function",
+        "line",
+        "sampled",
+        "queue_full",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        level: str = "INFO",
+        rate: float = LOG_SAMPLE_RATE,
+        burst: float = LOG_SAMPLE_BURST,
+    ):
+        self.name = name
+        self.level = level
+        self.logger = logger.opt(depth=1)
+        self.rate_per_ns = rate / 1e9
+        self.burst = burst
+        self.tokens = burst
+        self.refilled_ns = time.monotonic_ns()
+        self.suppressed = 0
+        self.module = self.function = None
+        self.line = 0
+        self.sampled = LOG_DROPPED.labels(name, "sampled")
+        self.queue_full = LOG_DROPPED.labels(name, "queue_full")
+
+    def __call__(self, message: str, *args):
+        if not sink.enabled:
+            self.logger.log(self.level, message, *args)
+            return
+        if self.rate_per_ns:
+            now_ns = time.monotonic_ns()
+            tokens = min(self.burst, self.tokens + (now_ns - self.refilled_ns) * self.rate_per_ns)
+            self.refilled_ns = now_ns
+            if tokens < 1:
+                self.tokens = tokens
+                self.suppressed += 1
+                self.sampled.inc()
+                return
+            self.tokens = tokens - 1
+        if self.function is None:
+            caller = sys._getframe(1)
+            self.module = caller.f_globals.get("__name__")
+            self.function, self.line = caller.f_code.co_name, caller.f_lineno
+        if sink.put((time.time_ns(), self, message, args, self.suppressed)):
+            self.suppressed = 0
+        else:
+            self.suppressed += 1
+            self.queue_full.inc()
+
+
+async def monitor_loop_stalls(interval: float = LOOP_STALL_INTERVAL):
+    """Observes how late the loop wakes a task sleeping `interval`, i.e. how long it was blocked"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_STALL.observe(max(loop.time() - started - interval, 0))
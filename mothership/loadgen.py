@@ -0,0 +1,291 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.11"
+# dependencies = ["websockets", "protobuf==5.29.4", "aiomqtt"]
+# ///
+"""Datagram load generator and end-to-end latency harness for the relay.
+
+Sends protobuf Announcements to the relay at every requested rate and times
+how long each one takes to show up on a local WebSocket sink. The relay has to
+forward to the sink, either start it yourself with
+WEBSOCKET_SERVER_URI=ws://127.0.0.1:8765 or let --spawn-relay do it.
+
+    ./loadgen.py --spawn-relay --rates 50,200,1000,5000 --duration 5
+
+With --mqtt every announce is also published to the broker the relay
+subscribes to, --udp-loss then drops a share of the datagrams so the MQTT
+copies have to cover for them.
+
+With --trace the spawned relay stamps its stage timestamps into every frame
+and each step also reports how much of the latency was spent inside the
+relay and how much between its send and the sink.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import aiomqtt
+import websockets
+
+from filters import sign
+from samples import BINANCE_ANNOUNCES, UPBIT_ANNOUNCES, make_announcement
+
+SEQUENCE = re.compile(r"#(\d+)-(\d+)$")
+
+# (name, weight, catalog, call_to_action, forwarded by the relay)
+MIX = [
+    ("binance-listing", 4, 48, True, True),
+    ("binance-noise", 3, 49, False, False),
+    ("upbit-listing", 2, 777, False, True),
+    ("upbit-noise", 1, 888, False, False),
+]
+
+
+class Step:
+    """Send times and arrivals of one rate step"""
+
+    def __init__(self, step_id: int, rate: int):
+        self.step_id = step_id
+        self.rate = rate
+        self.sent_ns: Dict[int, int] = {}
+        self.expected: set = set()
+        self.latencies_ns: List[int] = []
+        # from RELAY_TRACE frames: kernel receive -> sent, sent -> sink
+        self.relay_ns: List[int] = []
+        self.transport_ns: List[int] = []
+        self.unexpected = 0
+        self.send_lag_ns = 0
+
+
+def pick_title(kind_catalog: int, seq: int) -> str:
+    pool = BINANCE_ANNOUNCES if kind_catalog not in (777, 888) else UPBIT_ANNOUNCES
+    titles = [title for catalog, title, _ in pool if catalog == kind_catalog] or [
+        title for _, title, _ in pool
+    ]
+    return titles[seq % len(titles)]
+
+
+def build_datagrams(
+    step: Step, count: int, stale_ratio: float, sign_key: bytes = b""
+) -> List[bytes]:
+    kinds = random.choices(MIX, weights=[kind[1] for kind in MIX], k=count)
+    datagrams = []
+    now = int(time.time())
+    for seq, (_, _, catalog, cta, forwarded) in enumerate(kinds):
+        stale = random.random() < stale_ratio
+        title = f"{pick_title(catalog, seq)} #{step.step_id}-{seq}"
+        ts = now - 60 if stale else now + 600  # fresh for the step, inside FILTER_TS_FUTURE_MS
+        datagram = make_announcement(catalog, title, cta, ts=ts).SerializeToString()
+        datagrams.append(sign(datagram, sign_key) if sign_key else datagram)
+        if forwarded and not stale:
+            step.expected.add(seq)
+    return datagrams
+
+
+async def send_step(
+    step: Step, datagrams: List[bytes], target, mqtt=None, topic="", udp_loss: float = 0.0
+):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    interval_ns = 1e9 / step.rate
+    started = time.perf_counter_ns()
+    for seq, datagram in enumerate(datagrams):
+        due = started + seq * interval_ns
+        now = time.perf_counter_ns()
+        if due > now + 1_000_000:
+            await asyncio.sleep((due - now) / 1e9)
+        step.send_lag_ns = max(step.send_lag_ns, time.perf_counter_ns() - due)
+        step.sent_ns[seq] = time.perf_counter_ns()
+        if mqtt is not None:
+            await mqtt.publish(topic, datagram)
+        if random.random() >= udp_loss:
+            try:
+                sock.sendto(datagram, target)
+            except BlockingIOError:
+                await asyncio.sleep(0)
+                sock.sendto(datagram, target)
+        if seq % 64 == 0:
+            await asyncio.sleep(0)  # let the sink read while we blast
+    sock.close()
+
+
+def percentile(values: List[int], q: float) -> float:
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(q * len(values)))] / 1e6
+
+
+async def run(args) -> List[dict]:
+    steps: Dict[int, Step] = {}
+
+    async def sink(websocket):
+        try:
+            async for frame in websocket:
+                arrived = time.perf_counter_ns()
+                arrived_wall = time.time_ns()
+                message = json.loads(frame)
+                trace = message.get("trace")
+                for entry in message["entries"]:
+                    match = SEQUENCE.search(entry["title"])
+                    if not match:
+                        continue
+                    step = steps.get(int(match.group(1)))
+                    seq = int(match.group(2))
+                    if step is None or seq not in step.sent_ns:
+                        continue
+                    if seq in step.expected:
+                        step.latencies_ns.append(arrived - step.sent_ns[seq])
+                        if trace:
+                            step.relay_ns.append(trace["sent_ns"] - trace["received_ns"])
+                            step.transport_ns.append(arrived_wall - trace["sent_ns"])
+                    else:
+                        step.unexpected += 1
+        except websockets.ConnectionClosed:
+            pass  # relay went away, its reconnect shows up as a new handler
+
+    host, port = args.relay.split(":")
+    target = (host, int(port))
+    results = []
+    run_id = random.randint(1, 9999) * 100  # keeps titles unique across runs
+    mqtt = None
+    if args.mqtt:
+        mqtt_host, mqtt_port = args.mqtt.split(":")
+        mqtt = aiomqtt.Client(mqtt_host, int(mqtt_port))
+        await mqtt.__aenter__()
+    async with websockets.serve(sink, "127.0.0.1", args.sink_port, compression=None):
+        relay_process = spawn_relay(args) if args.spawn_relay else None
+        try:
+            await asyncio.sleep(args.warmup)
+            print_header()
+            for index, rate in enumerate(args.rates):
+                step = Step(run_id + index, rate)
+                steps[step.step_id] = step
+                count = max(1, int(rate * args.duration))
+                datagrams = build_datagrams(step, count, args.stale, args.sign_key.encode())
+                await send_step(step, datagrams, target, mqtt, args.mqtt_topic, args.udp_loss)
+                await asyncio.sleep(args.drain)
+                results.append(summarize(step, count))
+                print_result(results[-1])
+        finally:
+            if relay_process:
+                relay_process.terminate()
+                relay_process.wait()
+            if mqtt is not None:
+                await mqtt.__aexit__(None, None, None)
+    return results
+
+
+def spawn_relay(args) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        RELAY="1",
+        RELAY_WORKERS=str(args.workers),
+        WEBSOCKET_SERVER_URI=f"ws://127.0.0.1:{args.sink_port}",
+        UDP_PORT=args.relay.split(":")[1],
+        LOGURU_LEVEL=args.relay_log_level,
+        RELAY_TRACE="1" if args.trace else "0",
+        # everything comes from one socket, the per source limit would cap the rate steps
+        FILTER_RATE="0",
+        FILTER_SIGNING_KEYS=args.sign_key,
+    )
+    if args.mqtt:
+        env.update(
+            MQTT_HOST=args.mqtt.split(":")[0],
+            MQTT_PORT=args.mqtt.split(":")[1],
+            MQTT_ANNOUNCE_TOPIC=args.mqtt_topic,
+        )
+    here = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.Popen(
+        [sys.executable, os.path.join(here, "main.py")],
+        cwd=here,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=None if args.relay_log_level in ("WARNING", "ERROR") else subprocess.DEVNULL,
+    )
+
+
+def summarize(step: Step, sent: int) -> dict:
+    latencies = sorted(step.latencies_ns)
+    expected = len(step.expected)
+    result = {
+        "rate": step.rate,
+        "sent": sent,
+        "expected": expected,
+        "received": len(latencies),
+        "loss": 1 - len(latencies) / expected if expected else 0.0,
+        "unexpected": step.unexpected,
+        "p50_ms": percentile(latencies, 0.5),
+        "p99_ms": percentile(latencies, 0.99),
+        "p999_ms": percentile(latencies, 0.999),
+        "max_send_lag_ms": step.send_lag_ns / 1e6,
+    }
+    if step.relay_ns:
+        relay_ns, transport_ns = sorted(step.relay_ns), sorted(step.transport_ns)
+        result.update(
+            relay_p50_ms=percentile(relay_ns, 0.5),
+            relay_p99_ms=percentile(relay_ns, 0.99),
+            transport_p50_ms=percentile(transport_ns, 0.5),
+            transport_p99_ms=percentile(transport_ns, 0.99),
+        )
+    return result
+
+
+def print_header():
+    print(
+        f"{'rate/s':>8}{'sent':>8}{'expect':>8}{'recv':>8}{'loss':>8}"
+        f"{'p50 ms':>9}{'p99 ms':>9}{'p999 ms':>9}{'extra':>7}{'lag ms':>8}"
+    )
+
+
+def print_result(result: dict):
+    print(
+        f"{result['rate']:>8}{result['sent']:>8}{result['expected']:>8}{result['received']:>8}"
+        f"{result['loss']:>8.1%}{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+        f"{result['p999_ms']:>9.2f}{result['unexpected']:>7}{result['max_send_lag_ms']:>8.1f}"
+    )
+    if "relay_p50_ms" in result:
+        print(
+            f"{'':>8}relay p50 {result['relay_p50_ms']:.2f} p99 {result['relay_p99_ms']:.2f} ms, "
+            f"transport p50 {result['transport_p50_ms']:.2f} p99 {result['transport_p99_ms']:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--relay", default="127.0.0.1:8081", help="relay UDP host:port")
+    parser.add_argument("--sink-port", type=int, default=8765)
+    parser.add_argument(
+        "--rates", default="50,200,1000", help="comma separated datagrams per second"
+    )
+    parser.add_argument("--duration", type=float, default=5, help="seconds per rate step")
+    parser.add_argument("--drain", type=float, default=2, help="seconds to wait for stragglers")
+    parser.add_argument("--stale", type=float, default=0.1, help="share of stale timestamps")
+    parser.add_argument("--json", help="save results to this file")
+    parser.add_argument("--spawn-relay", action="store_true", help="run main.py as the relay")
+    parser.add_argument("--workers", type=int, default=1, help="RELAY_WORKERS for --spawn-relay")
+    parser.add_argument("--relay-log-level", default="INFO")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds before the first step")
+    parser.add_argument("--mqtt", help="also publish every announce to this broker host:port")
+    parser.add_argument("--mqtt-topic", default="announces")
+    parser.add_argument("--udp-loss", type=float, default=0.0, help="share of datagrams not sent")
+    parser.add_argument(
+        "--sign-key", default="", help="HMAC sign datagrams, FILTER_SIGNING_KEYS for --spawn-relay"
+    )
+    parser.add_argument(
+        "--trace", action="store_true", help="RELAY_TRACE for --spawn-relay, splits the latency"
+    )
+    args = parser.parse_args()
+    args.rates = [int(rate) for rate in args.rates.split(",")]
+
+    results = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
@@ -1,7 +1,7 @@
 #!/usr/bin/env -S uv run --script
 # /// script
 # requires-python = ">=3.11"
-# dependencies = ["prometheus_client",  "ipython", "websockets", "loguru", "protobuf==5.29.4", "cloudscraper", "aiohttp", "dnspython", "requests[socks]"]
+# dependencies = ["prometheus_client",  "ipython", "websockets", "loguru", "protobuf==5.29.4", "cloudscraper", "aiohttp", "aiohttp-socks", "dnspython", "requests[socks]", "aiomqtt"]
 # ///
 from loguru import logger
 import os
@@ -18,9 +18,13 @@ def print_build_date():
 if __name__ == "__main__":
     print_build_date()
     if os.environ.get("RELAY", None):
-        from relay import relay
+        from relay import relay, relay_workers
 
-        asyncio.run(relay())
+        workers = int(os.environ.get("RELAY_WORKERS", 1))
+        if workers > 1:
+            relay_workers(workers)
+        else:
+            asyncio.run(relay())
     if os.environ.get("CLOUDFLARE", None):
         from cloudflare import cloudflare
 
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import random
+import time
+
+import aiomqtt
+from loguru import logger
+from prometheus_client import Counter, Gauge
+
+MQTT_HOST = os.environ.get("MQTT_HOST", "")
+MQTT_PORT = int(os.environ.get("MQTT_PORT", 1883))
+MQTT_USERNAME = os.environ.get("MQTT_USERNAME", "binance")
+MQTT_PASSWORD = os.environ.get("MQTT_PASSWORD", "")
+# protobuf Announcements, the same bytes killer-whale sends as a datagram
+MQTT_ANNOUNCE_TOPIC = os.environ.get("MQTT_ANNOUNCE_TOPIC", "announces")
+# killer-whale's "catalog|total|tld" punch alerts, counted only
+MQTT_ALERT_TOPIC = os.environ.get("MQTT_ALERT_TOPIC", "binance")
+MQTT_BACKOFF_MIN = 0.1
+MQTT_BACKOFF_MAX = 10
+
+MQTT_CONNECTED = Gauge("relay_mqtt_connected", "1 while the relay is subscribed to the broker")
+MQTT_ALERTS = Counter(
+    "relay_mqtt_alerts_total", "Punch alerts seen on MQTT_ALERT_TOPIC", ["catalog"]
+)
+
+
+class MqttIngest:
+    """Second ingest path next to UdpIngest.
+
+    Announces published on MQTT_ANNOUNCE_TOPIC are put on the same batch
+    queue the UDP reader fills, so both copies of an announce race through
+    the same dedup stage and whichever arrives first is forwarded.
+    """
+
+    def __init__(self, batches: asyncio.Queue, host: str = MQTT_HOST, port: int = MQTT_PORT):
+        self.batches = batches
+        self.host = host
+        self.port = port
+        self.sender = f"mqtt:{host}"
+
+    async def run(self):
+        backoff = MQTT_BACKOFF_MIN
+        while True:
+            try:
+                async with aiomqtt.Client(
+                    self.host,
+                    self.port,
+                    username=MQTT_USERNAME or None,
+                    password=MQTT_PASSWORD or None,
+                    identifier=f"relay-{os.getpid()}",
+                    keepalive=10,
+                ) as client:
+                    await client.subscribe(MQTT_ANNOUNCE_TOPIC)
+                    if MQTT_ALERT_TOPIC:
+                        await client.subscribe(MQTT_ALERT_TOPIC)
+                    MQTT_CONNECTED.set(1)
+                    logger.info(
+                        f"Subscribed to {MQTT_ANNOUNCE_TOPIC} and {MQTT_ALERT_TOPIC} on {self.host}:{self.port}"
+                    )
+                    backoff = MQTT_BACKOFF_MIN
+                    async for message in client.messages:
+                        self.receive(message)
+            except aiomqtt.MqttError as ex:
+                MQTT_CONNECTED.set(0)
+                logger.warning(
+                    f"MQTT connection to {self.host}:{self.port} lost: {ex}, retry in {backoff:.1f}s"
+                )
+                await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+                backoff = min(backoff * 2, MQTT_BACKOFF_MAX)
+
+    def receive(self, message: aiomqtt.Message):
+        received_ns = time.time_ns()
+        payload = message.payload
+        if not isinstance(payload, (bytes, bytearray)):
+            return
+        if message.topic.matches(MQTT_ANNOUNCE_TOPIC):
+            self.batches.put_nowait([(bytes(payload), (self.sender, 0), received_ns, "mqtt")])
+        elif MQTT_ALERT_TOPIC and message.topic.matches(MQTT_ALERT_TOPIC):
+            catalog = payload.split(b"|", 1)[0].decode(errors="replace")
+            if not catalog.isdigit() or len(catalog) > 5:
+                catalog = "invalid"
+            MQTT_ALERTS.labels(catalog).inc()
+            logger.info(f"MQTT alert {payload.decode(errors='replace')}")
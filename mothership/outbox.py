@@ -0,0 +1,168 @@
+import asyncio
+import mmap
+import os
+import struct
+import time
+from typing import Dict, List, Set, Tuple
+
+from loguru import logger
+
+from senders import STALE_AFTER_MS
+
+OUTBOX_PATH = os.environ.get("OUTBOX_PATH", "relay-outbox.bin")
+OUTBOX_SIZE = int(os.environ.get("OUTBOX_SIZE", 8 * 1024 * 1024))
+OUTBOX_FLUSH_INTERVAL = float(os.environ.get("OUTBOX_FLUSH_INTERVAL", 0))
+# announces older than this are stale, the relay would not forward them either
+OUTBOX_REPLAY_MAX_AGE = float(os.environ.get("OUTBOX_REPLAY_MAX_AGE", STALE_AFTER_MS / 1000))
+
+MAGIC = b"TGOB"
+HEADER = struct.Struct("<4sIQQ")  # magic, version, ack offset, write offset
+RECORD = struct.Struct("<IIq")  # payload length, flags, announced at (unix ns)
+FLAG_ACKED = 1
+FLAG_BINARY = 2
+
+
+class Outbox:
+    """Memory-mapped append-only log of forwarded frames.
+
+    Every frame is appended before it is sent and acknowledged once the
+    uplink took it. The header keeps the offset below which everything is
+    acknowledged, records above it are replayed after a reconnect or a
+    restart. Appends are a memcpy into the page cache, durability against
+    power loss is traded for latency unless OUTBOX_FLUSH_INTERVAL is set.
+    """
+
+    def __init__(self, path: str = OUTBOX_PATH, size: int = OUTBOX_SIZE):
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, 0)
+        self.size = len(self.map)
+        # unacknowledged frames in append order, sequence -> record offset.
+        # callers hold sequences, offsets move when the log is compacted
+        self.pending: Dict[int, int] = {}
+        self.in_flight: Set[int] = set()
+        self.sequence = 0
+        magic, _, self.ack_offset, self.write_offset = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or not HEADER.size <= self.ack_offset <= self.write_offset <= self.size:
+            self.ack_offset = self.write_offset = HEADER.size
+            self.write_header()
+        self.recover()
+
+    def recover(self):
+        offset = self.ack_offset
+        while offset < self.write_offset:
+            length, flags, _ = RECORD.unpack_from(self.map, offset)
+            end = offset + RECORD.size + length
+            if end > self.write_offset:
+                break
+            if not flags & FLAG_ACKED:
+                self.sequence += 1
+                self.pending[self.sequence] = offset
+            offset = end
+        self.write_offset = offset
+        self.advance()
+        if self.pending:
+            logger.info(f"Outbox {self.path}: {len(self.pending)} unacknowledged frames to replay")
+
+    def write_header(self):
+        HEADER.pack_into(self.map, 0, MAGIC, 1, self.ack_offset, self.write_offset)
+
+    def append(self, frame, announced_ns: int = 0) -> int:
+        """Stores a frame, returns its sequence to ack() or release() later.
+
+        `announced_ns` is when the announce was released, replays skip it
+        once it is older than OUTBOX_REPLAY_MAX_AGE. Raises ValueError for a
+        frame larger than the whole outbox, nothing stored is dropped for it.
+        """
+        binary = isinstance(frame, bytes)
+        payload = frame if binary else frame.encode()
+        if RECORD.size + len(payload) > self.size - HEADER.size:
+            raise ValueError(f"Frame of {len(payload)} bytes does not fit outbox {self.path}")
+        end = self.write_offset + RECORD.size + len(payload)
+        if end > self.size:
+            self.compact(RECORD.size + len(payload))
+            end = self.write_offset + RECORD.size + len(payload)
+        offset = self.write_offset
+        RECORD.pack_into(
+            self.map, offset, len(payload), FLAG_BINARY if binary else 0, announced_ns or time.time_ns()
+        )
+        self.map[offset + RECORD.size : end] = payload
+        self.write_offset = end
+        self.sequence += 1
+        self.pending[self.sequence] = offset
+        self.in_flight.add(self.sequence)
+        self.write_header()
+        return self.sequence
+
+    def ack(self, sequence: int):
+        self.in_flight.discard(sequence)
+        offset = self.pending.pop(sequence, None)
+        if offset is None:
+            return
+        length, flags, _ = RECORD.unpack_from(self.map, offset)
+        RECORD.pack_into(self.map, offset, length, flags | FLAG_ACKED, 0)
+        self.advance()
+
+    def release(self, sequence: int):
+        """Send failed, leave the frame to the next replay"""
+        self.in_flight.discard(sequence)
+
+    def advance(self):
+        if self.pending:
+            # pending preserves append order, the first entry is the oldest one
+            self.ack_offset = next(iter(self.pending.values()))
+        else:
+            self.ack_offset = self.write_offset = HEADER.size
+        self.write_header()
+
+    def unacked(self, max_age: float = OUTBOX_REPLAY_MAX_AGE) -> List[Tuple[int, object]]:
+        """Frames to replay, oldest first, marked in flight until ack() or release().
+
+        Frames of announces older than `max_age` are acknowledged and skipped,
+        a late listing is worse than a missing one.
+        """
+        deadline = time.time_ns() - int(max_age * 1e9)
+        frames = []
+        expired = 0
+        for sequence, offset in list(self.pending.items()):
+            if sequence in self.in_flight:
+                continue
+            length, flags, announced_ns = RECORD.unpack_from(self.map, offset)
+            if announced_ns < deadline:
+                self.ack(sequence)
+                expired += 1
+                continue
+            payload = self.map[offset + RECORD.size : offset + RECORD.size + length]
+            self.in_flight.add(sequence)
+            frames.append((sequence, payload if flags & FLAG_BINARY else payload.decode()))
+        if expired:
+            logger.warning(f"Outbox {self.path}: {expired} unacknowledged frames too old to replay")
+        return frames
+
+    def compact(self, needed: int):
+        """Moves unacknowledged records to the front, drops the oldest ones if still short"""
+        while self.pending and self.write_offset - self.ack_offset + needed > self.size - HEADER.size:
+            oldest = next(iter(self.pending))
+            logger.error(f"Outbox {self.path} full, dropping unacknowledged frame {oldest}")
+            self.ack(oldest)
+        shift = self.ack_offset - HEADER.size
+        if shift:
+            self.map.move(HEADER.size, self.ack_offset, self.write_offset - self.ack_offset)
+            self.pending = {sequence: offset - shift for sequence, offset in self.pending.items()}
+            self.ack_offset -= shift
+            self.write_offset -= shift
+            self.write_header()
+        if self.write_offset + needed > self.size:
+            raise ValueError(f"Frame of {needed} bytes does not fit outbox {self.path}")
+
+    async def flush_periodically(self, interval: float = OUTBOX_FLUSH_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.map.flush)
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        os.close(self.fd)
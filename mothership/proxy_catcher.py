@@ -1,26 +1,43 @@
 import asyncio
+import heapq
 import logging
+import math
 import random
 import re
 import time
-from concurrent.futures import ThreadPoolExecutor
 import os
 import json
+from collections import deque
 
 
 import dns.resolver
-import requests
 from aiohttp import ClientError, ClientSession, ClientTimeout, web
+from aiohttp_socks import ProxyConnector
 from prometheus_client import (
     CONTENT_TYPE_LATEST,
     Counter,
     Gauge,
+    Histogram,
     generate_latest,
 )
 
+from proxy_scoring import ProxyScore, WeightedPool
+
 proxies = []
 self_managed_proxies = []
 last_updated = 0
+# verification history of every candidate of the last refresh
+scores: dict[str, ProxyScore] = {}
+# what /proxies and /random-proxies serve, rebuilt whenever proxies changes
+pool = WeightedPool(proxies, scores)
+# unverified, picked uniformly
+self_managed_pool = WeightedPool(self_managed_proxies, {})
+# verified proxies served next to the self managed ones -> monotonic time of their last check
+verified: dict[str, float] = {}
+# (due, proxy) of every verified proxy not being checked right now
+recheck_queue: list[tuple[float, str]] = []
+# downloaded proxies not verified yet, checked while the pool has room
+candidates: deque[str] = deque()
 
 # Prometheus metrics
 PROXY_COUNT = Gauge("proxy_catcher_proxy_count", "Number of available proxies")
@@ -33,79 +50,250 @@ PROXY_CHECKS_TOTAL = Counter(
 PROXY_CHECKS_SUCCESS = Counter(
     "proxy_catcher_proxy_checks_success", "Number of successful proxy checks"
 )
+PROXY_CHECK_LATENCY = Histogram(
+    "proxy_catcher_proxy_check_seconds",
+    "Time a successful proxy check took, handshake included",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 10),
+)
+
+PROXY_POOL_EVENTS = Counter(
+    "proxy_catcher_pool_events_total",
+    "Verified proxies promoted into or evicted from the served pool",
+    ["event"],
+)
+
+PROXY_SOURCE_FETCH_TIME = Histogram(
+    "proxy_catcher_source_fetch_seconds",
+    "Time to download a proxy source, 304s included",
+    ["source"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+PROXY_SOURCE_BYTES = Counter(
+    "proxy_catcher_source_bytes_total", "Bytes downloaded from a proxy source", ["source"]
+)
+PROXY_SOURCE_FETCHES = Counter(
+    "proxy_catcher_source_fetches_total",
+    "Proxy source downloads by result (ok, not_modified, error)",
+    ["source", "result"],
+)
+PROXY_SOURCE_PROXIES = Gauge(
+    "proxy_catcher_source_proxies", "Proxies listed by a source at the last refresh", ["source"]
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-requests.packages.urllib3.disable_warnings()
-
 URL_CHECK = os.environ.get(
     "URL_CHECK",
     "https://www.binance.com/bapi/apex/v1/public/apex/cms/article/list/query?type=1&pageNo=1&pageSize=2",
 )
+VERIFY_CONCURRENCY = int(os.environ.get("VERIFY_CONCURRENCY", 256))
+VERIFY_TIMEOUT = float(os.environ.get("VERIFY_TIMEOUT", 5))
+# seconds between two checks of a served proxy, jittered by 10%
+RECHECK_INTERVAL = float(os.environ.get("RECHECK_INTERVAL", 60))
+POOL_SIZE = int(os.environ.get("POOL_SIZE", 250))
+PROXY_CACHE_DIR = os.environ.get("PROXY_CACHE_DIR", "proxy-sources")
 
 
-def verify_proxy(proxy):
+async def verify_proxy(proxy, timeout=VERIFY_TIMEOUT):
     """
-    Verifies if a proxy is working using the requests library.
+    Verifies if a proxy is working by fetching URL_CHECK through it.
 
     Args:
-        proxy (str): The proxy address.
+        proxy (str): The proxy address, http://, socks4:// or socks5://.
+        timeout (float): Seconds the whole check may take, handshake included.
 
     Returns:
         str or None: The proxy if it's working, otherwise None.
     """
+    PROXY_CHECKS_TOTAL.inc()
+    score = scores.setdefault(proxy, ProxyScore())
+    started = time.monotonic()
     try:
-        proxies = {"http": proxy, "https": proxy}
-        headers = {"Range": "bytes=0-9"}
-        response = requests.get(
-            URL_CHECK, proxies=proxies, timeout=8, verify=False, headers=headers
-        )
-        if response.status_code >= 200 and response.status_code < 300:
-            logger.info(f"Proxy {proxy} OK: {response.status_code}")
-            return proxy
-        else:
-            logger.warning(f"Proxy {proxy} failed with status: {response.status_code}")
-            return None
+        connector = ProxyConnector.from_url(proxy, ssl=False)
+        async with asyncio.timeout(timeout):
+            async with ClientSession(connector=connector) as session:
+                async with session.get(URL_CHECK, headers={"Range": "bytes=0-9"}) as response:
+                    await response.read()
+                    status = response.status
     except Exception as e:
-        logger.warning(f"Proxy {proxy} failed with {e.__class__.__qualname__}")
+        score.record(False)
+        logger.debug(f"Proxy {proxy} failed with {e.__class__.__qualname__}")
         return None
-
-
-async def filter_working_proxies(proxies, concurrency_limit=3):
+    if status >= 200 and status < 300:
+        latency = time.monotonic() - started
+        score.record(True, latency)
+        PROXY_CHECKS_SUCCESS.inc()
+        PROXY_CHECK_LATENCY.observe(latency)
+        logger.debug(f"Proxy {proxy} OK: {status} in {latency:.2f}s")
+        return proxy
+    score.record(False)
+    logger.debug(f"Proxy {proxy} failed with status: {status}")
+    return None
+
+
+async def filter_working_proxies(proxies, concurrency_limit=VERIFY_CONCURRENCY):
     """
-    Filters a list of proxies, returning only the working ones,
-    while limiting the number of concurrent requests using a thread pool.
+    Filters a list of proxies, returning only the working ones.
+
+    Every check runs on the event loop, at most `concurrency_limit` at a
+    time, each bounded by VERIFY_TIMEOUT.
 
     Args:
         proxies (list): A list of proxy addresses.
-        concurrency_limit (int): The maximum number of concurrent requests.
+        concurrency_limit (int): The maximum number of concurrent checks.
 
     Returns:
-        list: A list of working proxy addresses.
+        list: A list of working proxy addresses, in the order given.
     """
-    working_proxies = []
     semaphore = asyncio.Semaphore(concurrency_limit)
 
     async def sem_verify_proxy(proxy):
         async with semaphore:
-            return verify_proxy(proxy)
-
-    with ThreadPoolExecutor(max_workers=concurrency_limit) as executor:
-        loop = asyncio.get_event_loop()
-        tasks = [
-            loop.run_in_executor(
-                executor, lambda p: asyncio.run(sem_verify_proxy(p)), proxy
-            )
-            for proxy in proxies
-        ]
-        results = await asyncio.gather(*tasks)
-        for proxy in results:
-            if proxy:
-                working_proxies.append(proxy)
+            return await verify_proxy(proxy)
+
+    started = time.monotonic()
+    results = await asyncio.gather(*(sem_verify_proxy(proxy) for proxy in proxies))
+    working_proxies = [proxy for proxy in results if proxy]
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Verified {len(proxies)} proxies in {elapsed:.1f}s ({len(proxies) / max(elapsed, 1e-3):.0f}/s), "
+        f"{len(working_proxies)} working"
+    )
     return working_proxies
 
 
+# sources with their transformation patterns, names label the metrics as urls carry keys
+SOURCES = [
+    {
+        "name": "webshare",
+        "url": "https://proxy.webshare.io/api/v2/proxy/list/download/ojepfofzjjasrgwppcznvbecqlxmxoxtkhtcdznu/-/any/username/direct/",
+        "pattern": r"([0-9.]+):([0-9]+):([^:]+):([a-z0-9]+)",
+        "replacement": r"socks5://\3:\4@\1:\2",
+    },
+    {
+        # santiment
+        "name": "webshare-santiment",
+        "url": "https://proxy.webshare.io/api/v2/proxy/list/download/qatpuawqcuhsigmsedblqzgcofisvdenujjyirwj/-/any/username/direct/",
+        "pattern": r"([0-9.]+):([0-9]+):([^:]+):([a-z0-9]+)",
+        "replacement": r"socks5://\3:\4@\1:\2",
+    },
+    {
+        "name": "ercindedeoglu-socks4",
+        "url": "https://raw.githubusercontent.com/ErcinDedeoglu/proxies/refs/heads/main/proxies/socks4.txt",
+        "pattern": r"(.+)",
+        "replacement": r"socks4://\1",
+    },
+    {
+        "name": "monosans-socks5",
+        "url": "https://raw.githubusercontent.com/monosans/proxy-list/refs/heads/main/proxies/socks5.txt",
+        "pattern": r"(.+)",
+        "replacement": r"socks5://\1",
+    },
+    {
+        "name": "monosans-socks4",
+        "url": "https://raw.githubusercontent.com/monosans/proxy-list/refs/heads/main/proxies/socks4.txt",
+        "pattern": r"(.+)",
+        "replacement": r"socks4://\1",
+    },
+    {
+        "name": "dpangestuw-socks5",
+        "url": "https://raw.githubusercontent.com/dpangestuw/Free-Proxy/refs/heads/main/socks5_proxies.txt",
+        "pattern": r"(.+)",
+        "replacement": r"socks5://\1",
+    },
+    {
+        "name": "best-proxies",
+        "url": "https://api.best-proxies.ru/proxylist.txt?key=4660317f00a7da7d037b2b0d50d2f135&limit=1100&type=socks4,socks5&includeType",
+        "pattern": r"(.+)",
+        "replacement": r"\1",
+    },
+    # {
+    #     "url": "https://api.best-proxies.ru/proxylist.txt?key=4660317f00a7da7d037b2b0d50d2f135&limit=600&type=https&includeType",
+    #     "pattern": r"(.+)",
+    #     "replacement": r"\1",
+    # },
+]
+
+
+def source_cache_path(source) -> str:
+    return os.path.join(PROXY_CACHE_DIR, source["name"])
+
+
+def read_source_cache(source):
+    """Last body and validators of a source, (None, {}) when not cached"""
+    path = source_cache_path(source)
+    try:
+        with open(f"{path}.json") as f:
+            validators = json.load(f)
+        with open(f"{path}.txt") as f:
+            return f.read(), validators
+    except (OSError, ValueError):
+        return None, {}
+
+
+def write_source_cache(source, text, validators):
+    path = source_cache_path(source)
+    try:
+        os.makedirs(PROXY_CACHE_DIR, exist_ok=True)
+        # body first and renamed, validators never point at a partial body
+        for suffix, content in ((".txt", text), (".json", json.dumps(validators))):
+            with open(f"{path}{suffix}.tmp", "w") as f:
+                f.write(content)
+            os.replace(f"{path}{suffix}.tmp", f"{path}{suffix}")
+    except OSError as e:
+        logger.warning(f"Failed to cache {source['name']}: {e}")
+
+
+async def fetch_source(session, source):
+    """
+    Downloads one proxy source, conditionally if a copy of it is cached.
+
+    Returns:
+        str or None: The body, the cached one if the source did not change
+        or could not be downloaded, None without either.
+    """
+    name = source["name"]
+    cached, validators = read_source_cache(source)
+    headers = {}
+    if cached is not None:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    started = time.monotonic()
+    try:
+        async with session.get(source["url"], headers=headers) as response:
+            if response.status == 304 and cached is not None:
+                result, text = "not_modified", cached
+            elif response.status == 200:
+                body = await response.read()
+                PROXY_SOURCE_BYTES.labels(name).inc(len(body))
+                result, text = "ok", body.decode(response.charset or "utf-8", errors="replace")
+                write_source_cache(
+                    source,
+                    text,
+                    {
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                    },
+                )
+            else:
+                logger.error(f"Failed to download from {name}, status: {response.status}")
+                result, text = "error", cached
+    except (ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Error downloading from {name}: {e!r}")
+        result, text = "error", cached
+    elapsed = time.monotonic() - started
+    PROXY_SOURCE_FETCH_TIME.labels(name).observe(elapsed)
+    PROXY_SOURCE_FETCHES.labels(name, result).inc()
+    if result != "error":
+        logger.info(f"Downloaded {name} in {elapsed:.2f}s ({result})")
+    elif text is not None:
+        logger.info(f"Using the cached copy of {name}")
+    return text
+
+
 def custom_proxies():
     return [
         "socks5://10.88.101.13:1080",  # nasduck
@@ -154,86 +342,24 @@ def resolve_k8s_proxies():
 
 
 async def download_proxies():
-    """Download proxies from multiple sources and format them"""
-    global proxies, self_managed_proxies, last_updated
-
-    # Sources with their transformation patterns
-    sources = [
-        {
-            "url": "https://proxy.webshare.io/api/v2/proxy/list/download/ojepfofzjjasrgwppcznvbecqlxmxoxtkhtcdznu/-/any/username/direct/",
-            "pattern": r"([0-9.]+):([0-9]+):([^:]+):([a-z0-9]+)",
-            "replacement": r"socks5://\3:\4@\1:\2",
-        },
-        {
-            # santiment
-            "url": "https://proxy.webshare.io/api/v2/proxy/list/download/qatpuawqcuhsigmsedblqzgcofisvdenujjyirwj/-/any/username/direct/",
-            "pattern": r"([0-9.]+):([0-9]+):([^:]+):([a-z0-9]+)",
-            "replacement": r"socks5://\3:\4@\1:\2",
-        },
-        {
-            "url": "https://raw.githubusercontent.com/ErcinDedeoglu/proxies/refs/heads/main/proxies/socks4.txt",
-            "pattern": r"(.+)",
-            "replacement": r"socks4://\1",
-        },
-        {
-            "url": "https://raw.githubusercontent.com/monosans/proxy-list/refs/heads/main/proxies/socks5.txt",
-            "pattern": r"(.+)",
-            "replacement": r"socks5://\1",
-        },
-        {
-            "url": "https://raw.githubusercontent.com/monosans/proxy-list/refs/heads/main/proxies/socks4.txt",
-            "pattern": r"(.+)",
-            "replacement": r"socks4://\1",
-        },
-        {
-            "url": "https://raw.githubusercontent.com/dpangestuw/Free-Proxy/refs/heads/main/socks5_proxies.txt",
-            "pattern": r"(.+)",
-            "replacement": r"socks5://\1",
-        },
-        {
-            "url": "https://api.best-proxies.ru/proxylist.txt?key=4660317f00a7da7d037b2b0d50d2f135&limit=1100&type=socks4,socks5&includeType",
-            "pattern": r"(.+)",
-            "replacement": r"\1",
-        },
-        # {
-        #     "url": "https://api.best-proxies.ru/proxylist.txt?key=4660317f00a7da7d037b2b0d50d2f135&limit=600&type=https&includeType",
-        #     "pattern": r"(.+)",
-        #     "replacement": r"\1",
-        # },
-    ]
+    """Download proxies from multiple sources and queue them for verification"""
+    global self_managed_proxies, self_managed_pool
 
     new_proxies = []
     timeout = ClientTimeout(total=10)
 
+    # concurrently, the refresh takes as long as the slowest source
     async with ClientSession(timeout=timeout) as session:
-        for source in sources:
-            try:
-                async with session.get(source["url"]) as response:
-                    if response.status == 200:
-                        text = await response.text()
-
-                        # Split by spaces and newlines, similar to tr ' ' '\n'
-                        lines = re.sub(r"\s+", "\n", text).strip().split("\n")
-
-                        for line in lines:
-                            if line.strip():
-                                # Apply the regex transformation
-                                transformed = re.sub(
-                                    source["pattern"],
-                                    source["replacement"],
-                                    line.strip(),
-                                )
-                                new_proxies.append(transformed)
-
-                        logger.info(
-                            f"Downloaded {len(lines)} items from {source['url']}"
-                        )
-                    else:
-                        logger.error(
-                            f"Failed to download from {source['url']}, status: {response.status}"
-                        )
-            except (ClientError, asyncio.TimeoutError) as e:
-                logger.error(f"Error downloading from {source['url']}: {e}")
+        results = await asyncio.gather(*(fetch_source(session, source) for source in SOURCES))
+    for source, text in zip(SOURCES, results):
+        if text is None:
+            continue
+        # Split by spaces and newlines, similar to tr ' ' '\n'
+        lines = [line for line in re.sub(r"\s+", "\n", text).strip().split("\n") if line]
+        for line in lines:
+            # Apply the regex transformation
+            new_proxies.append(re.sub(source["pattern"], source["replacement"], line))
+        PROXY_SOURCE_PROXIES.labels(source["name"]).set(len(lines))
 
     # Update self_managed_proxies
     temp_self_managed = []
@@ -244,37 +370,109 @@ async def download_proxies():
     smp_count = len(temp_self_managed)
     # temp_self_managed = await filter_working_proxies(temp_self_managed)  # python ssl errors
     self_managed_proxies = temp_self_managed
+    self_managed_pool = WeightedPool(self_managed_proxies, {})
     logger.info(
         f"{len(self_managed_proxies)} out of {smp_count} self managed proxies left"
     )
     random.shuffle(new_proxies)
-    start_time = time.time()
-    timeout_seconds = 200
-    for chunk in chunk_list(new_proxies, 100):
-        elapsed_time = time.time() - start_time
-        if elapsed_time >= timeout_seconds:
-            break
-        chunk_working_proxies = await filter_working_proxies(chunk, 3)
-        proxies.extend(chunk_working_proxies)
-        PROXY_COUNT.set(len(proxies))
-        last_updated = time.time()
-        LAST_UPDATE_TIMESTAMP.set(last_updated)
-
-    proxies = list(dict.fromkeys(proxies))
-    if len(proxies) > 300:
-        proxies = proxies[:250]
-    proxies.extend(self_managed_proxies)
-    proxies = list(dict.fromkeys(proxies))
-    logger.info(f"Proxy list updated with {len(proxies)} unique proxies")
-
-
-def chunk_list(data: list[str], chunk_size: int) -> list[list[str]]:
-    """Splits a list into smaller chunks of the specified size."""
-    return [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
+    # fresh lists replace whatever of the previous ones was not checked yet
+    candidates.clear()
+    candidates.extend(proxy for proxy in dict.fromkeys(new_proxies) if proxy not in verified)
+    publish_proxies()
+    # candidates no longer listed anywhere take their history with them
+    listed = set(new_proxies).union(proxies)
+    for proxy in [proxy for proxy in scores if proxy not in listed]:
+        del scores[proxy]
+    logger.info(f"Queued {len(candidates)} candidates, serving {len(proxies)} proxies")
+
+
+def publish_proxies():
+    """Serves the verified proxies and the self managed ones"""
+    global proxies, pool, last_updated
+    proxies = list(dict.fromkeys([*verified, *self_managed_proxies]))
+    pool = WeightedPool(proxies, scores)
+    PROXY_COUNT.set(len(proxies))
+    last_updated = time.time()
+    LAST_UPDATE_TIMESTAMP.set(last_updated)
+
+
+def schedule_recheck(proxy):
+    now = time.monotonic()
+    verified[proxy] = now
+    heapq.heappush(recheck_queue, (now + RECHECK_INTERVAL * random.uniform(0.9, 1.1), proxy))
+
+
+async def recheck(proxy):
+    """Checks a served proxy again, a failure evicts it right away"""
+    if await verify_proxy(proxy):
+        schedule_recheck(proxy)
+        # recorded in place, picks follow once the samplers are refreshed
+        pool.rescore()
+        return
+    del verified[proxy]
+    PROXY_POOL_EVENTS.labels("evicted").inc()
+    publish_proxies()
+    logger.info(f"Evicted {proxy}, {len(verified)} verified proxies left")
+
+
+async def promote(proxy):
+    """Serves a candidate once it passes a check and the pool has room"""
+    if not await verify_proxy(proxy) or proxy in verified:
+        return
+    if len(verified) >= POOL_SIZE:
+        # filled up meanwhile, first in line when room opens
+        candidates.appendleft(proxy)
+        return
+    schedule_recheck(proxy)
+    PROXY_POOL_EVENTS.labels("promoted").inc()
+    publish_proxies()
+    logger.debug(f"Promoted {proxy}, {len(verified)} verified proxies")
+
+
+async def verify_continuously(concurrency_limit=VERIFY_CONCURRENCY):
+    """
+    Keeps the served pool verified without a periodic stall.
+
+    Served proxies are checked again round-robin, each RECHECK_INTERVAL
+    after its last check, and evicted on the first failure. Free check
+    slots go to candidates while fewer than POOL_SIZE proxies are verified.
+    Rechecks that are due always go first.
+    """
+    semaphore = asyncio.Semaphore(concurrency_limit)
+    checks = set()
+
+    async def check(verify, proxy):
+        try:
+            await verify(proxy)
+        finally:
+            semaphore.release()
+
+    try:
+        while True:
+            await semaphore.acquire()
+            now = time.monotonic()
+            if recheck_queue and recheck_queue[0][0] <= now:
+                _, proxy = heapq.heappop(recheck_queue)
+                verify = recheck
+            elif candidates and len(verified) < POOL_SIZE:
+                proxy = candidates.popleft()
+                verify = promote
+            else:
+                semaphore.release()
+                # woken at least every second to notice new candidates or room
+                idle = recheck_queue[0][0] - now if recheck_queue else 1
+                await asyncio.sleep(min(idle, 1))
+                continue
+            task = asyncio.create_task(check(verify, proxy))
+            checks.add(task)
+            task.add_done_callback(checks.discard)
+    finally:
+        for task in checks:
+            task.cancel()
 
 
 async def refresh_proxies_periodically(refresh_seconds=900):
-    """Refresh the proxy list every N seconds"""
+    """Refresh the candidate list every N seconds"""
     while True:
         try:
             await download_proxies()
@@ -285,29 +483,32 @@ async def refresh_proxies_periodically(refresh_seconds=900):
 
 
 async def get_proxies(request):
-    """HTTP handler to serve the proxy list"""
-    response_text = "\n".join(proxies)
-    return web.Response(text=response_text)
+    """HTTP handler to serve the proxy list, 304 while it did not change"""
+    headers = {"ETag": pool.etag}
+    if request.headers.get("If-None-Match") == headers["ETag"]:
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=pool.body, content_type="text/plain", charset="utf-8", headers=headers)
 
 
 async def get_random_proxies(request):
     """HTTP handler to serve a random subset of the proxy list
-    Query parameter 'count' determines how many proxies to return
+    Query parameter 'count' determines how many proxies to return,
+    'max_latency' (seconds) leaves out proxies slower on average.
+    Proxies are picked weighted by success rate / latency.
     """
     prefix = str(request.query.get("prefix", ""))
     try:
         count = int(request.query.get("count", "1"))
         count = max(1, count)
-        count = min(count, len(proxies))
+        count = min(count, len(pool))
     except ValueError:
         count = 1
-    available_proxies = proxies
-    if prefix:
-        available_proxies = [proxy for proxy in proxies if proxy.startswith(prefix)]
+    try:
+        max_latency = float(request.query.get("max_latency", "inf"))
+    except ValueError:
+        max_latency = math.inf
 
-    shuffled_proxies = random.sample(
-        available_proxies, min(count, len(available_proxies))
-    )
+    shuffled_proxies = pool.sample(count, prefix, max_latency)
     response_text = "\n".join(shuffled_proxies)
     return web.Response(text=response_text)
 
@@ -320,18 +521,11 @@ async def get_random_self_managed_proxies(request):
     try:
         count = int(request.query.get("count", "1"))
         count = max(1, count)
-        count = min(count, len(self_managed_proxies))
+        count = min(count, len(self_managed_pool))
     except ValueError:
         count = 1
-    available_proxies = self_managed_proxies
-    if prefix:
-        available_proxies = [
-            proxy for proxy in self_managed_proxies if proxy.startswith(prefix)
-        ]
-
-    shuffled_proxies = random.sample(
-        available_proxies, min(count, len(available_proxies))
-    )
+
+    shuffled_proxies = self_managed_pool.sample(count, prefix)
     response_text = "\n".join(shuffled_proxies)
     return web.Response(text=response_text)
 
@@ -340,6 +534,7 @@ async def get_stats(request):
     """HTTP handler to show statistics"""
     stats = {
         "proxy_count": len(proxies),
+        "pool_version": pool.version,
         "last_updated": last_updated,
         "last_updated_formatted": time.strftime(
             "%Y-%m-%d %H:%M:%S", time.localtime(last_updated)
@@ -365,17 +560,19 @@ async def metrics(request):
 
 
 async def start_background_tasks(app):
-    """Start the background task to refresh proxies periodically"""
+    """Start the background tasks refreshing and verifying proxies"""
     app["proxy_refresh_task"] = asyncio.create_task(refresh_proxies_periodically())
+    app["proxy_verify_task"] = asyncio.create_task(verify_continuously())
 
 
 async def cleanup_background_tasks(app):
-    """Clean up the background task when the application is shutting down"""
-    app["proxy_refresh_task"].cancel()
-    try:
-        await app["proxy_refresh_task"]
-    except asyncio.CancelledError:
-        logger.info("Proxy refresh task cancelled")
+    """Clean up the background tasks when the application is shutting down"""
+    for name in ("proxy_refresh_task", "proxy_verify_task"):
+        app[name].cancel()
+        try:
+            await app[name]
+        except asyncio.CancelledError:
+            logger.info(f"{name} cancelled")
 
 
 def server():
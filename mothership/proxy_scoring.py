@@ -0,0 +1,167 @@
+import hashlib
+import itertools
+import math
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# weight of the newest check in the moving averages
+SCORE_ALPHA = float(os.environ.get("SCORE_ALPHA", 0.3))
+# latency assumed for proxies never verified, the self managed ones
+SCORE_DEFAULT_LATENCY = float(os.environ.get("SCORE_DEFAULT_LATENCY", 1.0))
+# latencies below this weigh the same, a proxy next door must not take every pick
+SCORE_MIN_LATENCY = float(os.environ.get("SCORE_MIN_LATENCY", 0.05))
+# distinct (prefix, max_latency) samplers kept per pool
+SAMPLER_CACHE_SIZE = 32
+# seconds picks may lag behind changed scores, samplers are rebuilt at most this often
+SCORE_REFRESH_INTERVAL = float(os.environ.get("SCORE_REFRESH_INTERVAL", 1.0))
+
+
+@dataclass(slots=True)
+class ProxyScore:
+    """Moving averages of a proxy's verification checks"""
+
+    latency: float = SCORE_DEFAULT_LATENCY
+    success: float = 1.0
+    checks: int = 0
+    successes: int = 0
+
+    def record(self, ok: bool, latency: Optional[float] = None):
+        if ok and latency is not None:
+            if self.successes == 0:
+                # replaces the default instead of being averaged with it
+                self.latency = latency
+            else:
+                self.latency += SCORE_ALPHA * (latency - self.latency)
+            self.successes += 1
+        self.success += SCORE_ALPHA * (ok - self.success)
+        self.checks += 1
+
+    @property
+    def weight(self) -> float:
+        return self.success / max(self.latency, SCORE_MIN_LATENCY)
+
+
+DEFAULT_SCORE = ProxyScore()
+
+
+class AliasTable:
+    """Vose's alias method, O(n) to build and O(1) per weighted draw"""
+
+    __slots__ = ("items", "weights", "probability", "alias")
+
+    def __init__(self, items: Sequence[str], weights: Sequence[float]):
+        self.items = list(items)
+        n = len(self.items)
+        total = sum(weights)
+        if total <= 0:
+            weights = [1.0] * n
+            total = float(n)
+        self.weights = list(weights)
+        scaled = [weight * n / total for weight in self.weights]
+        self.probability = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+        # what is left over is 1 up to rounding and keeps probability 1
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def draw(self) -> str:
+        i = int(random.random() * len(self.items))
+        return self.items[i] if random.random() < self.probability[i] else self.items[self.alias[i]]
+
+    def sample(self, count: int) -> List[str]:
+        """`count` distinct items, each pick weighted among the ones not picked yet"""
+        count = min(count, len(self.items))
+        if count <= 0:
+            return []
+        if 2 * count <= len(self.items):
+            # redraw duplicates, cheap while most of the weight is still unpicked
+            picked: Dict[str, None] = {}
+            for _ in range(8 * count):
+                picked[self.draw()] = None
+                if len(picked) == count:
+                    return list(picked)
+        return self.shuffle()[:count]
+
+    def shuffle(self) -> List[str]:
+        """Weighted random order of every item, Efraimidis-Spirakis, O(n log n)"""
+        # log of u ** (1 / weight), the power underflows to 0 for small weights
+        keys = [
+            math.log(1.0 - random.random()) / weight if weight > 0 else -math.inf
+            for weight in self.weights
+        ]
+        order = sorted(range(len(self.items)), key=keys.__getitem__, reverse=True)
+        return [self.items[i] for i in order]
+
+
+class WeightedPool:
+    """Versioned snapshot of the served proxies and their weights.
+
+    Built whenever the proxy list changes, which bumps the version. Proxies
+    are indexed by scheme next to their live scores; samplers for each
+    (prefix, max_latency) asked for are built from the matching indexes on
+    first use and cached. Changed scores only mark the samplers stale, they
+    are rebuilt at most every SCORE_REFRESH_INTERVAL.
+    """
+
+    versions = itertools.count(1)
+
+    def __init__(self, proxies: Sequence[str], scores: Dict[str, ProxyScore]):
+        self.version = next(self.versions)
+        self.proxies = list(proxies)
+        self.body = "\n".join(self.proxies).encode()
+        # of the content, versions restart with the process and a client may hold an old one
+        self.etag = f'"{hashlib.blake2b(self.body, digest_size=8).hexdigest()}"'
+        # scheme (socks4, socks5, http, "" without one) -> (proxy, score)
+        self.schemes: Dict[str, List[Tuple[str, ProxyScore]]] = {}
+        for proxy in self.proxies:
+            scheme = proxy.split("://", 1)[0] if "://" in proxy else ""
+            self.schemes.setdefault(scheme, []).append((proxy, scores.get(proxy, DEFAULT_SCORE)))
+        self.samplers: Dict[Tuple[str, float], AliasTable] = {}
+        self.stale = False
+        self.refreshed_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.proxies)
+
+    def rescore(self):
+        """Scores of the served proxies changed in place, samplers follow on a later pick"""
+        self.stale = True
+
+    def sampler(self, prefix: str = "", max_latency: float = math.inf) -> AliasTable:
+        if self.stale:
+            now = time.monotonic()
+            if now - self.refreshed_at >= SCORE_REFRESH_INTERVAL:
+                self.samplers.clear()
+                self.stale = False
+                self.refreshed_at = now
+        key = (prefix, max_latency)
+        table = self.samplers.get(key)
+        if table is None:
+            # only indexes a proxy starting with prefix can be in
+            chosen = [
+                (proxy, score.weight)
+                for scheme, entries in self.schemes.items()
+                if scheme.startswith(prefix) or prefix.startswith(scheme)
+                for proxy, score in entries
+                if proxy.startswith(prefix) and score.latency <= max_latency
+            ]
+            table = AliasTable([proxy for proxy, _ in chosen], [weight for _, weight in chosen])
+            if len(self.samplers) >= SAMPLER_CACHE_SIZE:
+                self.samplers.clear()
+            self.samplers[key] = table
+        return table
+
+    def sample(self, count: int, prefix: str = "", max_latency: float = math.inf) -> List[str]:
+        return self.sampler(prefix, max_latency).sample(count)
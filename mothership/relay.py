@@ -1,22 +1,138 @@
 import asyncio
+from collections import OrderedDict, deque
+import ctypes
 from enum import Enum
+import hashlib
 import json
+import multiprocessing.connection
 import os
 import socket
+import struct
 from abc import ABCMeta
 from dataclasses import asdict, dataclass, field
-from typing import List, Set
+from json.encoder import encode_basestring_ascii as json_string
+from typing import Deque, List, Optional, Set, Tuple, Union
 import re
+import signal
+import sys
 import time
 
-import websockets
 from all_pb2 import Announcement
+from broadcast import BROADCAST_PORT, BroadcastServer
+from filters import DatagramFilter
+from hotlog import LogSite, monitor_loop_stalls, sink as log_sink
+from google.protobuf.message import DecodeError
 from loguru import logger
+from mqtt_ingest import MQTT_HOST, MqttIngest
+from outbox import OUTBOX_FLUSH_INTERVAL, OUTBOX_PATH, Outbox
+from routing import (
+    FORWARD_CALL_TO_ACTION,
+    FORWARD_NEVER,
+    PRIORITY_DEFAULT,
+    ROUTES_RELOAD_INTERVAL,
+    RoutingTable,
+)
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+import relay_pb2
+from senders import STALE_AFTER_MS, SenderTable
+from symbols import SYMBOLS_RELOAD_INTERVAL, TOKENS_BLACKLIST, SymbolDictionary
+from uplink import Uplink
 
 WEBSOCKET_SERVER_URI = os.environ.get("WEBSOCKET_SERVER_URI", "ws://localhost:8080")
 UDP_HOST = os.environ.get("UDP_HOST", "0.0.0.0")
 UDP_PORT = int(os.environ.get("UDP_PORT", 8081))
 DRY_RUN = int(os.environ.get("DRY_RUN", 1)) > 0
+UDP_RECV_SIZE = 1300
+UDP_DRAIN_LIMIT = int(os.environ.get("UDP_DRAIN_LIMIT", 256))
+UDP_RCVBUF = int(os.environ.get("UDP_RCVBUF", 4 * 1024 * 1024))
+# not exported by the socket module, value from asm-generic/socket.h
+SO_TIMESTAMPNS = getattr(socket, "SO_TIMESTAMPNS", 35)
+TIMESPEC = struct.Struct("@ll")
+DEDUP_TTL_SECONDS = float(os.environ.get("DEDUP_TTL_SECONDS", 60))
+DEDUP_MAX_ENTRIES = int(os.environ.get("DEDUP_MAX_ENTRIES", 100_000))
+RELAY_METRICS_PORT = int(os.environ.get("RELAY_METRICS_PORT", 8082))
+FORWARD_QUEUE_SIZE = int(os.environ.get("FORWARD_QUEUE_SIZE", 1024))
+# "binary" offers protobuf frames to the server, JSON stays the fallback
+RELAY_FRAMING = os.environ.get("RELAY_FRAMING", "json")
+BINARY_SUBPROTOCOL = "tradegang.pb.v1"
+JSON_SUBPROTOCOL = "tradegang.json.v1"
+# client_id of every JSON frame, binary frames leave it out
+CLIENT_ID = "bombardino coccodrillo"
+# adds the relay's stage timestamps and a trace id to every forwarded frame
+RELAY_TRACE = int(os.environ.get("RELAY_TRACE", 0)) > 0
+
+# Prometheus metrics
+RELAY_RECEIVED = Counter(
+    "relay_announces_received_total", "Announces decoded from datagrams", ["cex", "catalog"]
+)
+RELAY_DROPPED = Counter(
+    "relay_announces_dropped_total",
+    "Announces not forwarded, by reason",
+    ["cex", "catalog", "reason"],
+)
+RELAY_FORWARDED = Counter(
+    "relay_announces_forwarded_total", "Announces sent to the server", ["cex", "catalog"]
+)
+RELAY_SEND_FAILED = Counter(
+    "relay_send_failures_total", "Announces the uplink could not send", ["cex", "catalog"]
+)
+RELAY_MALFORMED = Counter("relay_datagrams_malformed_total", "Datagrams that failed to decode")
+RELAY_PROCESS_TIME = Histogram(
+    "relay_process_seconds",
+    "Time to decode and check a forwarded announce",
+    ["cex", "catalog"],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01),
+)
+RELAY_SEND_TIME = Histogram(
+    "relay_send_seconds",
+    "Time to hand an announce to the uplink, including waiting for a connection",
+    ["cex", "catalog"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+INGEST_WINS = Counter(
+    "relay_ingest_wins_total", "Announces whose first copy arrived over this path", ["path"]
+)
+INGEST_DUPLICATES = Counter(
+    "relay_ingest_duplicates_total", "Later copies of announces, by path", ["path"]
+)
+DEDUP_WINS = Counter(
+    "relay_dedup_wins_total",
+    "Announces forwarded as the first arrival, by sender",
+    ["sender"],
+)
+DEDUP_DUPLICATES = Counter(
+    "relay_dedup_duplicates_total",
+    "Duplicate announces dropped by the dedup cache, by sender",
+    ["sender"],
+)
+DEDUP_SPREAD = Histogram(
+    "relay_dedup_spread_seconds",
+    "Delay of a duplicate announce behind the first arrival",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+FORWARD_QUEUE_DEPTH = Gauge(
+    "relay_forward_queue_depth", "Announces waiting for the uplink", ["priority"]
+)
+FORWARD_QUEUE_WAIT = Histogram(
+    "relay_forward_queue_wait_seconds",
+    "Time an announce waited for the uplink",
+    ["priority"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+STAGE_LATENCY = Histogram(
+    "relay_stage_seconds",
+    "Time from kernel receive timestamp to the end of each relay stage",
+    ["stage"],
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.1, 0.5, 1),
+)
+OUTBOX_SKIPPED = Counter(
+    "relay_outbox_skipped_total", "Frames sent without being stored in the outbox first"
+)
+FORWARD_QUEUE_DROPPED = Counter(
+    "relay_forward_queue_dropped_total",
+    "Announces dropped because the forward queue was full",
+    ["priority"],
+)
 
 
 class SetEncoder(json.JSONEncoder):
@@ -26,7 +142,7 @@ class SetEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
-@dataclass
+@dataclass(slots=True)
 class BaseMessage(metaclass=ABCMeta):
     def to_json_str(self):
         return json.dumps(asdict(self), cls=SetEncoder)
@@ -37,7 +153,7 @@ class PageEntryCEX(Enum):
     UPBIT = "upbit"
 
 
-@dataclass
+@dataclass(slots=True)
 class PageEntry:
     title: str
     ts: int
@@ -45,101 +161,648 @@ class PageEntry:
     catalog_id: int
     cex: str
 
+    def to_json_str(self) -> str:
+        # same bytes json.dumps(asdict(self)) produces, without the deep copy.
+        # asdict() rebuilds the token set from a list, which can reorder it
+        tokens = ", ".join([json_string(token) for token in set(list(self.tokens))])
+        return (
+            f'{{"title": {json_string(self.title)}, "ts": {self.ts}, "tokens": [{tokens}], '
+            f'"catalog_id": {self.catalog_id}, "cex": {json_string(self.cex)}}}'
+        )
+
+
+@dataclass(slots=True)
+class Trace:
+    """Where an announce spent its time in the relay, unix ns"""
+
+    id: str
+    received_ns: int
+    parsed_ns: int
+    queued_ns: int
+    sent_ns: int
+
+    def to_json_str(self) -> str:
+        return (
+            f'{{"id": {json_string(self.id)}, "received_ns": {self.received_ns}, '
+            f'"parsed_ns": {self.parsed_ns}, "queued_ns": {self.queued_ns}, "sent_ns": {self.sent_ns}}}'
+        )
+
+    def to_proto(self) -> relay_pb2.Trace:
+        return relay_pb2.Trace(
+            id=self.id,
+            received_ns=self.received_ns,
+            parsed_ns=self.parsed_ns,
+            queued_ns=self.queued_ns,
+            sent_ns=self.sent_ns,
+        )
 
-@dataclass
+
+@dataclass(slots=True)
 class NewAnnounces(BaseMessage):
     type: str = field(init=False, default="new_announces")
     client_id: str
     entries: List[PageEntry]
     dry_run: bool = False
 
+    def to_json_str(self, trace: Optional[Trace] = None) -> str:
+        entries = ", ".join([entry.to_json_str() for entry in self.entries])
+        # without a trace the frame stays byte for byte what consumers always got
+        traced = f', "trace": {trace.to_json_str()}' if trace else ""
+        return (
+            f'{{"type": {json_string(self.type)}, "client_id": {json_string(self.client_id)}, '
+            f'"entries": [{entries}], "dry_run": {"true" if self.dry_run else "false"}{traced}}}'
+        )
 
-async def run_udp_server():
-    """Runs the UDP server and forwards data to the WebSocket server."""
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.bind((UDP_HOST, UDP_PORT))
-    logger.info(f"UDP server listening on {UDP_HOST}:{UDP_PORT}, DRYRUN: {DRY_RUN}")
-
-    while True:
-        data, addr = sock.recvfrom(1300)
-        message = Announcement()
-        message.ParseFromString(data)  # .decode("utf-8")
-        cex = PageEntryCEX.BINANCE.value
-        dry_run = False
-        decoded_tokens = None
-
-        if message.catalog == 777 or message.catalog == 888:  # upbit announce
-            decoded_tokens = parse_upbit_listing_tokens(message.title)
-            cex = PageEntryCEX.UPBIT.value
-            dry_run = True
-        if message.catalog == 777:
-            cex = PageEntryCEX.UPBIT.value
-            message.catalog = 48  # listing
-            dry_run = False
-        dry_run = dry_run or DRY_RUN
-
-        json_forward_announce = NewAnnounces(
-            "bombardino coccodrillo",
-            [
-                PageEntry(
-                    title=message.title,
-                    ts=message.ts,
-                    tokens=decoded_tokens or set(message.tokens),
-                    catalog_id=message.catalog,
-                    cex=cex,
+    def to_proto_bytes(self, trace: Optional[Trace] = None) -> bytes:
+        return relay_pb2.NewAnnounces(
+            entries=[
+                relay_pb2.PageEntry(
+                    title=entry.title,
+                    ts=entry.ts,
+                    tokens=entry.tokens,
+                    catalog_id=entry.catalog_id,
+                    cex=entry.cex,
                 )
+                for entry in self.entries
             ],
-            dry_run=dry_run,
-        )
-        json_str = json_forward_announce.to_json_str()
-        # Convert timestamp from seconds to milliseconds
-        message_ts_ms = message.ts * 1000
-        current_time_ms = int(time.time() * 1000)
-        time_diff_ms = current_time_ms - message_ts_ms
+            dry_run=self.dry_run,
+            trace=trace.to_proto() if trace else None,
+        ).SerializeToString()
+
+
+@dataclass(slots=True)
+class Forward:
+    """Announce on its way to the uplink"""
+
+    announces: NewAnnounces
+    priority: int = PRIORITY_DEFAULT
+    queued_ns: int = 0
+    # kernel receive timestamp, unix ns
+    received_ns: int = 0
+    # end of handle_datagram, unix ns
+    parsed_ns: int = 0
+    # announce fingerprint, the same for every copy and every relay
+    trace_id: str = ""
+    # metric labels
+    cex: str = ""
+    catalog: str = ""
+
+    @property
+    def announced_ns(self) -> int:
+        """When the announce was released, unix ns"""
+        return min(entry.ts for entry in self.announces.entries) * 1_000_000_000
+
+    def trace(self, sent_ns: int) -> Trace:
+        # queued_ns is monotonic, moved onto the wall clock through sent_ns
+        queued_ns = sent_ns - (time.monotonic_ns() - self.queued_ns)
+        return Trace(self.trace_id, self.received_ns, self.parsed_ns, queued_ns, sent_ns)
+
+    def encode(self, binary: bool = False, trace: Optional[Trace] = None):
+        """Frame for the negotiated uplink framing"""
+        if binary:
+            return self.announces.to_proto_bytes(trace)
+        return self.announces.to_json_str(trace)
+
+
+def reframe(frame):
+    """Converts an encoded JSON frame to a binary one and back, trace included"""
+    if isinstance(frame, bytes):
+        message = relay_pb2.NewAnnounces.FromString(frame)
+        entries = [
+            PageEntry(entry.title, entry.ts, set(entry.tokens), entry.catalog_id, entry.cex)
+            for entry in message.entries
+        ]
+        trace = None
+        if message.HasField("trace"):
+            trace = Trace(
+                message.trace.id,
+                message.trace.received_ns,
+                message.trace.parsed_ns,
+                message.trace.queued_ns,
+                message.trace.sent_ns,
+            )
+        return NewAnnounces(CLIENT_ID, entries, dry_run=message.dry_run).to_json_str(trace)
+    message = json.loads(frame)
+    entries = [
+        PageEntry(entry["title"], entry["ts"], set(entry["tokens"]), entry["catalog_id"], entry["cex"])
+        for entry in message["entries"]
+    ]
+    trace = Trace(**message["trace"]) if "trace" in message else None
+    announces = NewAnnounces(message["client_id"], entries, dry_run=message["dry_run"])
+    return announces.to_proto_bytes(trace)
+
+
+def announce_fingerprint(message: Announcement) -> bytes:
+    """Identifies the same announce reported by different pollers"""
+    title = " ".join(message.title.split()).casefold()
+    tokens = ",".join(sorted(message.tokens))
+    key = f"{message.catalog}|{message.ts}|{title}|{tokens}"
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+
+class DedupCache:
+    """TTL evicting set of announce fingerprints.
+
+    Entries are kept in arrival order, so eviction only ever looks at the
+    oldest ones and both lookup and eviction are O(1) per announce.
+    """
+
+    def __init__(
+        self, ttl_seconds: float = DEDUP_TTL_SECONDS, max_entries: int = DEDUP_MAX_ENTRIES
+    ):
+        self.ttl_ns = int(ttl_seconds * 1e9)
+        self.max_entries = max_entries
+        # fingerprint -> (first arrival ns, winner)
+        self.entries: OrderedDict[bytes, Tuple[int, str]] = OrderedDict()
+
+    def claim(self, fingerprint: bytes, sender: str, now_ns: int) -> Optional[Tuple[int, str]]:
+        """Returns None for the first arrival, otherwise (first arrival ns, winner)"""
+        self.evict(now_ns)
+        first = self.entries.get(fingerprint)
+        if first is not None:
+            return first
+        self.entries[fingerprint] = (now_ns, sender)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return None
+
+    def evict(self, now_ns: int):
+        deadline = now_ns - self.ttl_ns
+        while self.entries:
+            arrived_ns, _ = next(iter(self.entries.values()))
+            if arrived_ns > deadline:
+                break
+            self.entries.popitem(last=False)
+
+
+class SharedDedupCache:
+    """DedupCache shared by forked relay workers.
+
+    Fixed size open addressing table in shared memory guarded by a process
+    lock. Probing is bounded to PROBES slots, the oldest (or an expired)
+    slot in the window is reused for a new fingerprint.
+    """
+
+    SLOT = struct.Struct("16sqB47s")  # fingerprint, first arrival ns, winner
+    PROBES = 8
+
+    def __init__(
+        self, ttl_seconds: float = DEDUP_TTL_SECONDS, max_entries: int = DEDUP_MAX_ENTRIES
+    ):
+        context = multiprocessing.get_context("fork")
+        self.ttl_ns = int(ttl_seconds * 1e9)
+        self.slots = max_entries
+        self.table = context.RawArray(ctypes.c_char, self.SLOT.size * max_entries)
+        self.lock = context.Lock()
+
+    def claim(self, fingerprint: bytes, sender: str, now_ns: int) -> Optional[Tuple[int, str]]:
+        """Returns None for the first arrival, otherwise (first arrival ns, winner)"""
+        start = int.from_bytes(fingerprint[:8], "little")
+        deadline = now_ns - self.ttl_ns
+        with self.lock:
+            victim, victim_arrived_ns = 0, None
+            for probe in range(self.PROBES):
+                offset = ((start + probe) % self.slots) * self.SLOT.size
+                stored, arrived_ns, length, winner = self.SLOT.unpack_from(self.table, offset)
+                if stored == fingerprint and arrived_ns > deadline:
+                    return arrived_ns, winner[:length].decode()
+                if victim_arrived_ns is None or arrived_ns < victim_arrived_ns:
+                    victim, victim_arrived_ns = offset, arrived_ns
+            encoded = sender.encode()[:47]
+            self.SLOT.pack_into(self.table, victim, fingerprint, now_ns, len(encoded), encoded)
+        return None
+
+
+dedup_cache = DedupCache()
+sender_table = SenderTable()
+symbol_dictionary = SymbolDictionary()
+routing_table = RoutingTable()
+datagram_filter = DatagramFilter()
+
+# hot path log calls, sampled and written off the loop with LOG_ASYNC=1
+log_received = LogSite("received")
+log_duplicate = LogSite("duplicate", "DEBUG")
+log_not_listing = LogSite("not_listing", "DEBUG")
+log_no_call_to_action = LogSite("no_call_to_action", "DEBUG")
+log_stale = LogSite("stale")
+log_malformed = LogSite("malformed", "DEBUG")
+log_queue_full = LogSite("queue_full", "WARNING")
+log_sent = LogSite("sent")
+
+
+class UdpIngest:
+    """Non-blocking UDP reader.
 
+    Registered as a loop reader, so nothing blocks while the socket is idle.
+    Every wakeup drains all queued datagrams (up to UDP_DRAIN_LIMIT) and hands
+    them to the processing stage as a single batch of (data, addr, received ns,
+    path).
+    The receive time is the kernel timestamp of the datagram where the
+    platform has SO_TIMESTAMPNS, so time spent in the socket queue and waiting
+    for the loop is part of every measured latency.
+    """
+
+    def __init__(self, sock: socket.socket, rcvbuf: int = UDP_RCVBUF):
+        sock.setblocking(False)
+        if rcvbuf:
+            # bursts queue in the kernel while the loop is busy, the kernel caps it at rmem_max
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+            self.kernel_timestamps = True
+        except OSError:
+            self.kernel_timestamps = False
         logger.info(
-            f"Received {json_forward_announce} from {addr}. Time difference: {time_diff_ms}ms"
+            f"UDP receive buffer {sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)} bytes, "
+            f"kernel timestamps: {self.kernel_timestamps}"
         )
+        self.sock = sock
+        self.ancillary_size = socket.CMSG_SPACE(TIMESPEC.size)
+        self.batches: asyncio.Queue = asyncio.Queue()
+        self.loop = asyncio.get_running_loop()
+        self.loop.add_reader(sock.fileno(), self.drain)
+
+    def drain(self):
+        batch = []
+        for _ in range(UDP_DRAIN_LIMIT):
+            try:
+                data, ancillary, _, addr = self.sock.recvmsg(UDP_RECV_SIZE, self.ancillary_size)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as ex:
+                logger.warning(f"UDP receive failed: {ex!r}")
+                break
+            read_ns = time.time_ns()
+            received_ns = read_ns
+            for level, kind, payload in ancillary:
+                if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS:
+                    seconds, nanoseconds = TIMESPEC.unpack_from(payload)
+                    received_ns = seconds * 1_000_000_000 + nanoseconds
+            STAGE_LATENCY.labels("read").observe((read_ns - received_ns) / 1e9)
+            batch.append((data, addr, received_ns, "udp"))
+        if batch:
+            self.batches.put_nowait(batch)
+
+    def close(self):
+        self.loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+
+
+class ForwardQueue:
+    """Bounded priority queue between processing and the uplink.
+
+    FIFO within a priority, lower priority value first. When full, the newest
+    announce of the least important class is dropped to make room, or the new
+    one if nothing queued is less important, so a listing never waits behind
+    noise and is never dropped for it.
+    """
+
+    def __init__(self, maxsize: int = FORWARD_QUEUE_SIZE, levels: int = PRIORITY_DEFAULT + 1):
+        self.maxsize = maxsize
+        self.queues: List[Deque[Forward]] = [deque() for _ in range(levels)]
+        self.size = 0
+        self.not_empty = asyncio.Event()
+
+    def put(self, forward: Forward) -> bool:
+        if self.size >= self.maxsize:
+            victim = self.least_important()
+            if victim <= forward.priority:
+                FORWARD_QUEUE_DROPPED.labels(forward.priority).inc()
+                return False
+            self.queues[victim].pop()
+            self.size -= 1
+            FORWARD_QUEUE_DEPTH.labels(victim).dec()
+            FORWARD_QUEUE_DROPPED.labels(victim).inc()
+        forward.queued_ns = time.monotonic_ns()
+        self.queues[forward.priority].append(forward)
+        self.size += 1
+        FORWARD_QUEUE_DEPTH.labels(forward.priority).inc()
+        self.not_empty.set()
+        return True
+
+    async def get(self) -> Forward:
+        while not self.size:
+            self.not_empty.clear()
+            await self.not_empty.wait()
+        for priority, queue in enumerate(self.queues):
+            if queue:
+                forward = queue.popleft()
+                self.size -= 1
+                FORWARD_QUEUE_DEPTH.labels(priority).dec()
+                FORWARD_QUEUE_WAIT.labels(priority).observe(
+                    (time.monotonic_ns() - forward.queued_ns) / 1e9
+                )
+                return forward
+
+    def least_important(self) -> int:
+        for priority in range(len(self.queues) - 1, -1, -1):
+            if self.queues[priority]:
+                return priority
+        return -1
 
-        if message_ts_ms < (current_time_ms - 5000):  # 5 seconds in milliseconds
-            logger.info(
-                f"Received stale announce from {addr}: message.ts={message_ts_ms}ms, current_time={current_time_ms}ms, difference={time_diff_ms}ms"
+
+def handle_datagram(
+    data: bytes, addr, received_ns: int = 0, path: str = "udp"
+) -> Optional[Forward]:
+    """Decodes an announce datagram, returns the frame to forward or None"""
+    started = time.perf_counter_ns()
+    sender = addr[0]
+    received_ns = received_ns or time.time_ns()
+    if datagram_filter.reject_reason(data, sender) is not None:
+        return None
+    message = Announcement()
+    message.ParseFromString(data)  # .decode("utf-8")
+    current_time_ms = int(time.time() * 1000)
+    if datagram_filter.reject_message_reason(data, message, sender, current_time_ms) is not None:
+        return None
+    route = routing_table.route(message.catalog)
+    cex = route.cex
+    # labels keep the catalog as sent, the route may forward it under another id
+    catalog = routing_table.label(message.catalog)
+    RELAY_RECEIVED.labels(cex, catalog).inc()
+    arrived_ns = time.monotonic_ns()
+    # Convert timestamp from seconds to milliseconds
+    message_ts_ms = message.ts * 1000
+    time_diff_ms = current_time_ms - message_ts_ms
+    fingerprint = announce_fingerprint(message)
+    first = dedup_cache.claim(fingerprint, sender, arrived_ns)
+    # source addresses can be spoofed, labels are capped like the sender table's
+    sender_label = sender_table.label(sender)
+    if first is not None:
+        first_arrived_ns, winner = first
+        DEDUP_DUPLICATES.labels(sender_label).inc()
+        INGEST_DUPLICATES.labels(path).inc()
+        DEDUP_SPREAD.observe((arrived_ns - first_arrived_ns) / 1e9)
+        sender_table.arrived(sender, time_diff_ms, arrived_ns - first_arrived_ns)
+        RELAY_DROPPED.labels(cex, catalog, "duplicate").inc()
+        log_duplicate(
+            "Duplicate announce from {}, {:.1f}ms behind {}",
+            addr,
+            (arrived_ns - first_arrived_ns) / 1e6,
+            winner,
+        )
+        return None
+    DEDUP_WINS.labels(sender_label).inc()
+    INGEST_WINS.labels(path).inc()
+    sender_table.arrived(sender, time_diff_ms)
+    log_received(
+        "Received {} announce {!r} (catalog {}) from {}. Time difference: {}ms",
+        cex,
+        message.title,
+        message.catalog,
+        addr,
+        time_diff_ms,
+    )
+
+    # every check runs before anything is built, a dropped announce costs a dict lookup
+    if route.forward == FORWARD_NEVER:
+        RELAY_DROPPED.labels(cex, catalog, route.reason).inc()
+        log_not_listing("No need to relay. Not a listing")
+        return None
+    if message_ts_ms < (current_time_ms - STALE_AFTER_MS):
+        sender_table.stale(sender)
+        RELAY_DROPPED.labels(cex, catalog, "stale").inc()
+        log_stale(
+            "Received stale announce from {}: message.ts={}ms, current_time={}ms, difference={}ms",
+            addr,
+            message_ts_ms,
+            current_time_ms,
+            time_diff_ms,
+        )
+        return None
+    if route.forward == FORWARD_CALL_TO_ACTION and not message.call_to_action:
+        RELAY_DROPPED.labels(cex, catalog, "no_call_to_action").inc()
+        log_no_call_to_action("No need to relay")
+        return None
+
+    if route.tokens == "title":
+        if symbol_dictionary.symbols:
+            tokens = set(symbol_dictionary.tokens(message.title))
+        else:
+            tokens = parse_upbit_listing_tokens(message.title)
+    else:
+        tokens = set(message.tokens)
+    json_forward_announce = NewAnnounces(
+        CLIENT_ID,
+        [
+            PageEntry(
+                title=message.title,
+                ts=message.ts,
+                tokens=tokens or set(message.tokens),
+                catalog_id=message.catalog if route.catalog_id is None else route.catalog_id,
+                cex=cex,
             )
-            continue
-        if cex == PageEntryCEX.BINANCE.value and not message.call_to_action:
-            logger.debug("No need to relay")
-            continue
-        if message.catalog == 888:
-            logger.debug("No need to relay. Not a listing")
-            continue
+        ],
+        dry_run=route.dry_run or DRY_RUN,
+    )
+    RELAY_PROCESS_TIME.labels(cex, catalog).observe((time.perf_counter_ns() - started) / 1e9)
+    return Forward(
+        json_forward_announce,
+        route.priority,
+        received_ns=received_ns,
+        parsed_ns=time.time_ns(),
+        trace_id=fingerprint.hex(),
+        cex=cex,
+        catalog=catalog,
+    )
+
+
+async def process_datagrams(ingest: UdpIngest, queue: ForwardQueue):
+    """Processing stage: decodes drained batches and queues them for the uplink"""
+    while True:
+        batch = await ingest.batches.get()
+        for data, addr, received_ns, path in batch:
+            try:
+                forward = handle_datagram(data, addr, received_ns, path)
+            except DecodeError:
+                RELAY_MALFORMED.inc()
+                # junk floods would flood the log too, relay_datagrams_malformed_total counts them
+                log_malformed("Malformed datagram from {}, {} bytes", addr, len(data))
+                continue
+            except Exception:
+                logger.exception(f"Failed to process datagram from {addr}")
+                continue
+            if forward is None:
+                continue
+            STAGE_LATENCY.labels("process").observe((forward.parsed_ns - received_ns) / 1e9)
+            if not queue.put(forward):
+                RELAY_DROPPED.labels(forward.cex, forward.catalog, "queue_full").inc()
+                log_queue_full("Forward queue full, dropped announce from {}", addr)
 
+
+async def forward_announces(
+    queue: ForwardQueue, uplink: Union[Uplink, BroadcastServer], outbox: Optional[Outbox]
+):
+    """Uplink stage: sends queued announces, most important first"""
+    while True:
+        forward = await queue.get()
+        trace = forward.trace(time.time_ns()) if RELAY_TRACE else None
+        frame = forward.encode(uplink.subprotocol == BINARY_SUBPROTOCOL, trace)
+        sequence = None
+        if outbox:
+            try:
+                sequence = outbox.append(frame, forward.announced_ns)
+            except ValueError as ex:
+                # still worth sending, it just cannot be replayed
+                OUTBOX_SKIPPED.inc()
+                logger.error(f"Sending {forward.trace_id[:8]} without the outbox: {ex}")
+        sent = False
+        started = time.perf_counter_ns()
         try:
-            async with websockets.connect(WEBSOCKET_SERVER_URI) as websocket:
-                await websocket.send(json_str)
-                logger.info("Successfully sent to WebSocket server")
+            sent = await uplink.send(frame)
+            RELAY_SEND_TIME.labels(forward.cex, forward.catalog).observe(
+                (time.perf_counter_ns() - started) / 1e9
+            )
+            if sent:
+                RELAY_FORWARDED.labels(forward.cex, forward.catalog).inc()
+                total_ms = (time.time_ns() - forward.received_ns) / 1e6
+                STAGE_LATENCY.labels("sent").observe(total_ms / 1000)
+                log_sent(
+                    "Successfully sent {} to WebSocket server in {:.3f}ms, {:.3f}ms after the datagram arrived",
+                    forward.trace_id[:8],
+                    uplink.last_send_ms,
+                    total_ms,
+                )
+            else:
+                logger.error("Error sending to WebSocket server")
         except Exception:
             logger.exception("Error sending to WebSocket server")
+        if not sent:
+            RELAY_SEND_FAILED.labels(forward.cex, forward.catalog).inc()
+        if sequence is None:
+            continue
+        if sent:
+            outbox.ack(sequence)
+        else:
+            outbox.release(sequence)
 
 
-async def relay():
-    await asyncio.gather(run_udp_server())
+async def replay_outbox(outbox: Outbox, uplink: Union[Uplink, BroadcastServer]):
+    """Resends whatever was not acknowledged before the uplink (re)connected"""
+    frames = outbox.unacked()
+    if frames:
+        logger.info(f"Replaying {len(frames)} unacknowledged frames from the outbox")
+    for sequence, frame in frames:
+        try:
+            sent = await uplink.send(frame)
+        except (DecodeError, ValueError, KeyError, TypeError) as ex:
+            # stored in the other framing and not convertible, it would fail every replay
+            logger.error(f"Skipping outbox frame {sequence}, it cannot be reframed: {ex!r}")
+            outbox.ack(sequence)
+            continue
+        if sent:
+            outbox.ack(sequence)
+        else:
+            outbox.release(sequence)
 
 
-def parse_upbit_listing_tokens(message) -> Set[str]:
-    TOKENS_BLACKLIST = {
-        "BNB",
-        "USD",
-        "COIN",
-        "FD",
-        "USDC",
-        "BTC",
-        "ETH",
-        "SOL",
-        "KRW",
-        "LISTING",
-        "UPBIT",
-    }
+async def run_udp_server(worker: int = 0, reuse_port: bool = False):
+    """Runs the UDP server and forwards data to the WebSocket server."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if reuse_port:
+        # the kernel spreads senders over every worker bound to the port
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((UDP_HOST, UDP_PORT))
+    logger.info(
+        f"UDP server listening on {UDP_HOST}:{UDP_PORT}, DRYRUN: {DRY_RUN}, framing: {RELAY_FRAMING}, "
+        f"trace: {RELAY_TRACE}, async log: {log_sink.enabled}"
+    )
+    outbox = None
+    background = [monitor_loop_stalls()]
+    if OUTBOX_PATH:
+        outbox = Outbox(OUTBOX_PATH if not reuse_port else f"{OUTBOX_PATH}.{worker}")
+        if OUTBOX_FLUSH_INTERVAL > 0:
+            background.append(outbox.flush_periodically())
+    if SYMBOLS_RELOAD_INTERVAL > 0:
+        background.append(symbol_dictionary.reload_periodically())
+    if ROUTES_RELOAD_INTERVAL > 0:
+        background.append(routing_table.reload_periodically())
+    if BROADCAST_PORT:
+        # bots subscribe to us, every announce is serialized once per framing in use
+        subprotocols = [BINARY_SUBPROTOCOL, JSON_SUBPROTOCOL]
+        if RELAY_FRAMING != "binary":
+            subprotocols.reverse()
+        uplink = BroadcastServer(
+            port=BROADCAST_PORT,
+            subprotocols=subprotocols,
+            binary_subprotocol=BINARY_SUBPROTOCOL,
+            reframe=reframe,
+        )
+    else:
+        subprotocols = [BINARY_SUBPROTOCOL, JSON_SUBPROTOCOL] if RELAY_FRAMING == "binary" else None
+        uplink = Uplink(
+            WEBSOCKET_SERVER_URI,
+            subprotocols=subprotocols,
+            binary_subprotocol=BINARY_SUBPROTOCOL,
+            reframe=reframe,
+        )
+    if outbox:
+        uplink.on_connect = lambda: replay_outbox(outbox, uplink)
+    uplink.start()
+    ingest = UdpIngest(sock)
+    if MQTT_HOST:
+        # same announces over the broker, dedup forwards whichever copy is first
+        background.append(MqttIngest(ingest.batches).run())
+    queue = ForwardQueue()
+    # one sender per pooled connection, so a slow send does not hold up the rest
+    senders = [forward_announces(queue, uplink, outbox) for _ in range(uplink.pool_size)]
+    try:
+        await asyncio.gather(process_datagrams(ingest, queue), *senders, *background)
+    finally:
+        ingest.close()
+        await uplink.close()
+        if outbox:
+            outbox.close()
+
+
+async def relay(worker: int = 0, reuse_port: bool = False):
+    start_http_server(RELAY_METRICS_PORT + worker)
+    logger.info(f"Relay metrics on http://0.0.0.0:{RELAY_METRICS_PORT + worker}/metrics")
+    await asyncio.gather(run_udp_server(worker, reuse_port))
+
+
+def run_worker(worker: int, shared_cache: SharedDedupCache):
+    global dedup_cache
+    dedup_cache = shared_cache
+    logger.info(f"Relay worker {worker} started, pid {os.getpid()}")
+    asyncio.run(relay(worker, reuse_port=True))
 
+
+def relay_workers(count: int):
+    """Runs `count` relay processes sharing UDP_PORT through SO_REUSEPORT.
+
+    Every worker has its own uplink and metrics port (RELAY_METRICS_PORT + n),
+    duplicates are dropped through a dedup table all workers share.
+    Broadcast mode is refused: each worker only sees the announces the
+    kernel hashed to it, a bot subscribed to one of them would miss the rest.
+    """
+    if BROADCAST_PORT:
+        logger.error("BROADCAST_PORT needs a single relay process, unset it or RELAY_WORKERS")
+        raise SystemExit(1)
+    context = multiprocessing.get_context("fork")
+    shared_cache = SharedDedupCache()
+    workers = [
+        context.Process(target=run_worker, args=(worker, shared_cache), daemon=True)
+        for worker in range(count)
+    ]
+    for process in workers:
+        process.start()
+    # daemon workers are only reaped on a clean exit, turn SIGTERM into one
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        # one dead worker leaves a share of the senders unserved, let the container restart
+        multiprocessing.connection.wait([process.sentinel for process in workers])
+        for process in workers:
+            if process.exitcode is not None:
+                logger.error(f"Relay worker pid {process.pid} exited with {process.exitcode}")
+        raise SystemExit(1)
+    finally:
+        for process in workers:
+            process.terminate()
+
+
+def parse_upbit_listing_tokens(message) -> Set[str]:
+    """Uppercase words of a title, used when there is no symbol dictionary"""
     tokens = re.findall(r"\b[A-Z0-9]+\b", message)
     if not tokens:
         return set()
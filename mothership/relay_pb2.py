@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: relay.proto
+# Protobuf Python Version: 5.29.0
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    5,
+    29,
+    0,
+    '',
+    'relay.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0brelay.proto\x12\x06protos"W\n\tPageEntry\x12\r\n\x05title\x18\x01 \x01(\t\x12\n\n\x02ts\x18\x02 \x01(\x04\x12\x0e\n\x06tokens\x18\x03 \x03(\t\x12\x12\n\ncatalog_id\x18\x04 \x01(\r\x12\x0b\n\x03cex\x18\x05 \x01(\t"_\n\x05Trace\x12\n\n\x02id\x18\x01 \x01(\t\x12\x13\n\x0breceived_ns\x18\x02 \x01(\x04\x12\x11\n\tparsed_ns\x18\x03 \x01(\x04\x12\x11\n\tqueued_ns\x18\x04 \x01(\x04\x12\x0f\n\x07sent_ns\x18\x05 \x01(\x04"a\n\x0cNewAnnounces\x12"\n\x07entries\x18\x01 \x03(\x0b2\x11.protos.PageEntry\x12\x0f\n\x07dry_run\x18\x02 \x01(\x08\x12\x1c\n\x05trace\x18\x03 \x01(\x0b2\r.protos.Traceb\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'relay_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_PAGEENTRY']._serialized_start=23
+  _globals['_PAGEENTRY']._serialized_end=110
+  _globals['_TRACE']._serialized_start=112
+  _globals['_TRACE']._serialized_end=207
+  _globals['_NEWANNOUNCES']._serialized_start=209
+  _globals['_NEWANNOUNCES']._serialized_end=306
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import os
+from dataclasses import dataclass, fields
+from typing import Dict, Optional
+
+from loguru import logger
+
+ROUTES_PATH = os.environ.get(
+    "ROUTES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "routes.json")
+)
+ROUTES_RELOAD_INTERVAL = float(os.environ.get("ROUTES_RELOAD_INTERVAL", 30))
+
+# forward priorities, lower goes first
+PRIORITY_LISTING = 0
+PRIORITY_DEFAULT = 1
+PRIORITIES = {"listing": PRIORITY_LISTING, "default": PRIORITY_DEFAULT}
+
+FORWARD_ALWAYS = "always"
+FORWARD_NEVER = "never"
+FORWARD_CALL_TO_ACTION = "call_to_action"
+
+# what the relay did before routes were configurable, used without a routes file
+DEFAULT_ROUTES = {
+    "routes": {
+        "48": {"cex": "binance", "forward": FORWARD_CALL_TO_ACTION, "priority": "listing"},
+        "777": {
+            "cex": "upbit",
+            "forward": FORWARD_ALWAYS,
+            "catalog_id": 48,
+            "tokens": "title",
+            "priority": "listing",
+        },
+        "888": {"cex": "upbit", "forward": FORWARD_NEVER},
+    },
+    "default": {"cex": "binance", "forward": FORWARD_CALL_TO_ACTION},
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Route:
+    """What happens to announces of one catalog"""
+
+    cex: str = "binance"
+    # always, never or call_to_action
+    forward: str = FORWARD_CALL_TO_ACTION
+    # catalog id the announce is forwarded with, None keeps the original
+    catalog_id: Optional[int] = None
+    # take the tokens from the message or extract them from the title
+    tokens: str = "message"
+    dry_run: bool = False
+    priority: int = PRIORITY_DEFAULT
+    # drop reason reported for forward=never
+    reason: str = "not_listing"
+
+    @classmethod
+    def compile(cls, spec: dict) -> "Route":
+        if not isinstance(spec, dict):
+            raise TypeError(f"Route must be an object, not {spec!r}")
+        known = {field.name for field in fields(cls)}
+        unknown = set(spec) - known
+        if unknown:
+            raise ValueError(f"Unknown route fields {sorted(unknown)}")
+        spec = dict(spec)
+        priority = spec.get("priority", PRIORITY_DEFAULT)
+        spec["priority"] = PRIORITIES[priority] if isinstance(priority, str) else int(priority)
+        route = cls(**spec)
+        if route.forward not in (FORWARD_ALWAYS, FORWARD_NEVER, FORWARD_CALL_TO_ACTION):
+            raise ValueError(f"Unknown forward mode {route.forward!r}")
+        if route.tokens not in ("message", "title"):
+            raise ValueError(f"Unknown token source {route.tokens!r}")
+        if route.priority not in PRIORITIES.values():
+            raise ValueError(f"Priority {route.priority} out of range")
+        # bool is an int, but forwarding with catalog true is a typo
+        if route.catalog_id is not None and (
+            not isinstance(route.catalog_id, int) or isinstance(route.catalog_id, bool)
+        ):
+            raise TypeError(f"Catalog id must be an integer, not {route.catalog_id!r}")
+        if not isinstance(route.cex, str) or not isinstance(route.reason, str):
+            raise TypeError(f"Route cex and reason must be strings, not {route.cex!r}, {route.reason!r}")
+        if not isinstance(route.dry_run, bool):
+            raise TypeError(f"Route dry_run must be true or false, not {route.dry_run!r}")
+        return route
+
+
+class RoutingTable:
+    """Catalog -> Route dispatch, compiled from a JSON file.
+
+    The file has a "routes" object keyed by catalog id and a "default"
+    route for every other catalog. It is reloaded when it changes; a file
+    that does not compile is logged and the previous table stays in use.
+    """
+
+    def __init__(self, path: str = ROUTES_PATH):
+        self.path = path
+        self.mtime_ns = 0
+        self.routes: Dict[int, Route] = {}
+        self.default = Route()
+        self.load(DEFAULT_ROUTES)
+        self.reload()
+
+    def load(self, config: dict):
+        routes = {int(catalog): Route.compile(spec) for catalog, spec in config["routes"].items()}
+        default = Route.compile(config.get("default", {}))
+        # swapped together, a lookup never mixes two tables
+        self.routes, self.default = routes, default
+
+    def reload(self) -> bool:
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            if self.mtime_ns == 0:
+                logger.info(f"No routes file at {self.path}, using the built-in routes")
+                self.mtime_ns = -1
+            return False
+        except OSError as ex:
+            logger.error(f"Routes in {self.path} not checked, keeping the previous ones: {ex!r}")
+            return False
+        if mtime_ns == self.mtime_ns:
+            return False
+        self.mtime_ns = mtime_ns
+        try:
+            with open(self.path) as f:
+                self.load(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as ex:
+            logger.error(f"Routes in {self.path} not loaded, keeping the previous ones: {ex!r}")
+            return False
+        logger.info(f"Loaded {len(self.routes)} routes from {self.path}")
+        return True
+
+    async def reload_periodically(self, interval: float = ROUTES_RELOAD_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.reload()
+            except Exception:
+                logger.exception(f"Failed to reload routes from {self.path}")
+
+    def route(self, catalog: int) -> Route:
+        return self.routes.get(catalog, self.default)
+
+    def label(self, catalog: int) -> str:
+        """Metric label of a catalog, bounded by the table, datagrams can carry any id"""
+        return str(catalog) if catalog in self.routes else "other"
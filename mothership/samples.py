@@ -0,0 +1,195 @@
+import time
+from typing import List, Set, Tuple
+
+from all_pb2 import Announcement
+
+# real titles as seen by killer-whale, (catalog, title, call_to_action)
+BINANCE_ANNOUNCES: List[Tuple[int, str, bool]] = [
+    (
+        48,
+        "Binance Will Add Sahara AI (SAHARA) on Earn, Buy Crypto, Convert, Margin & Futures",
+        True,
+    ),
+    (
+        48,
+        "Binance Will List Mubarak (MUBARAK), CZ'S Dog (BROCCOLI714), Tutorial (TUT), and Banana For Scale (BANANAS31) With Seed Tags Applied",
+        True,
+    ),
+    (
+        48,
+        "Binance Will Add Newton Protocol (NEWT) on Earn, Buy Crypto, Convert, Margin & Futures",
+        True,
+    ),
+    (161, "Binance Will Delist ALPHA, BSW, KMD, LEVER, LTO on 2025-07-04", True),
+    (161, "Notice of Removal of Spot Trading Pairs - 2025-06-27", False),
+    (
+        49,
+        "Introducing Dymension (DYM) on BNSOL Super Stake: HODL BNSOL & DeFi BNSOL Assets to Get DYM APR Boost Airdrop Rewards",
+        False,
+    ),
+    (
+        49,
+        "Binance Will Update the Collateral Ratio of Multiple Assets Under Portfolio Margin (2025-07-04)",
+        False,
+    ),
+]
+
+UPBIT_ANNOUNCES: List[Tuple[int, str, bool]] = [
+    (777, "Market Support for Optimism(OP) (KRW, BTC, USDT Market)", False),
+    (777, "Market Support for Huma Finance(HUMA) (BTC, USDT Market)", False),
+    (777, "Market Support for Sahara AI(SAHARA) (KRW, BTC, USDT Market)", False),
+    (
+        888,
+        "Notice on Termination of Trading Support for Pundi AI(PUNDIAI) (8/28 15:00)",
+        False,
+    ),
+    (
+        888,
+        "Temporary Suspension of AKT, XEC Digital Asset Withdrawals due to Wallet System Maintenance (Completed)",
+        False,
+    ),
+    (888, "GAS/VTHO Distribution for the 4th week of July, 2025", False),
+]
+
+ALL_ANNOUNCES = BINANCE_ANNOUNCES + UPBIT_ANNOUNCES
+
+
+def make_announcement(
+    catalog: int, title: str, call_to_action: bool, ts: int = 0
+) -> Announcement:
+    """Builds an Announcement the way killer-whale fills it in"""
+    tokens = []
+    if catalog not in (777, 888):
+        # killer-whale sends the tickers it found in parentheses
+        tokens = [part.split(")")[0] for part in title.split("(")[1:] if ")" in part]
+    return Announcement(
+        ts=ts or int(time.time()),
+        catalog=catalog,
+        title=title,
+        call_to_action=call_to_action,
+        tokens=tokens,
+    )
+
+# titles from killer-whale's test-server.py and upbit-announce.json with the
+# symbols each announce is about, quote currencies excluded
+TOKEN_TITLES: List[Tuple[str, Set[str]]] = [
+    ("BADGER Available via Credit/Debit Card", {"BADGER"}),
+    ("Binance Earn Enables API Functionality for SOL Staking", set()),
+    (
+        "Binance Earn July Monthly Challenge: Enjoy Up to 3,600 USDC Rewards and 33.65% APR on Dual Investment",
+        set(),
+    ),
+    ("Binance Earn: Notice on Removal of Dual Investment Token Pairs - 2025-02-21", set()),
+    ("Binance Futures API Updates (2024-10-30)", set()),
+    (
+        "Binance Will Add Sahara AI (SAHARA) on Earn, Buy Crypto, Convert, Margin & Futures",
+        {"SAHARA"},
+    ),
+    (
+        "Binance Will Delist AERGO, AST, BURGER, COMBO, LINA on 2025-03-28",
+        {"AERGO", "AST", "BURGER", "COMBO", "LINA"},
+    ),
+    (
+        "Binance Will Delist ALPHA, BSW, KMD, LEVER, LTO on 2025-07-04",
+        {"ALPHA", "BSW", "KMD", "LEVER", "LTO"},
+    ),
+    (
+        "Binance Will Delist CVP, EPX, FOR, LOOM, REEF, VGX on 2024-08-26",
+        {"CVP", "EPX", "FOR", "LOOM", "REEF", "VGX"},
+    ),
+    (
+        "Binance Will Support the Doodles (DOOD) Airdrop for MUBARAK, BROCCOLI714, TST, 1MBABYDOGE, and KOMA Holders",
+        {"DOOD"},
+    ),
+    (
+        "Binance Will Support the Polygon (POL) Network Upgrade & Hard Fork - 2025-07-01",
+        {"POL"},
+    ),
+    (
+        "Binance Will Support the Vechain (VET) and VeThor Token (VTHO) Network Upgrade & Hard Fork - 2025-07-01",
+        {"VET", "VTHO"},
+    ),
+    (
+        "Binance Will Update the Collateral Ratio of Multiple Assets Under Portfolio Margin (2025-07-04)",
+        set(),
+    ),
+    (
+        "BugsCoin Trading Competition: Trade BugsCoin (BGSC) and Share About $1M Worth of Rewards",
+        {"BGSC"},
+    ),
+    (
+        "Buy ARB, ID, RDNT, TUSD & USDC Directly Using Credit/Debit Cards and Fiat Balances",
+        {"ARB", "ID", "RDNT", "TUSD"},
+    ),
+    (
+        "Introducing Dymension (DYM) on BNSOL Super Stake: HODL BNSOL & DeFi BNSOL Assets to Get DYM APR Boost Airdrop Rewards",
+        {"DYM"},
+    ),
+    ("Notice of Removal of Margin Trading Pairs - 2025-03-25", set()),
+    ("Notice of Removal of Spot Trading Pairs - 2025-03-28 & 2025-03-31", set()),
+    ("Notice on New Trading Pairs & Trading Bots Services on Binance Spot - 2025-07-01", set()),
+    (
+        "Solayer (LAYER) Airdrop Continues: Second Binance HODLer Airdrops Announced – Earn LAYER With Retroactive BNB Simple Earn Subscriptions (2025-06-16)",
+        {"LAYER"},
+    ),
+    ("업비트 코인빌리기 - 테더(USDT) 지원 종료 안내", set()),
+    ("네트워크 업그레이드에 따른 루나2(LUNA2) 출금 일시 중단 안내 (완료)", {"LUNA2"}),
+    ("명품시계의 인기 아이콘 Rolex Submariner, 126613LB 드롭스 ", set()),
+    (
+        "Notice on Termination of Trading Support for Pundi AI(PUNDIAI) (8/28 15:00)",
+        {"PUNDIAI"},
+    ),
+    ("포스트 단색화 거장 김태호 화백이 마지막으로 남긴 유산 드롭스", set()),
+    ("Digital assets and Fiat deposit Due Diligence report (as of July 1st, 2025)", set()),
+    ("Market Support for Optimism(OP) (KRW, BTC, USDT Market)", {"OP"}),
+    (
+        "Temporary suspension of Deposit/Withdrawal service for ATOM due to Network Upgrade (Completed)",
+        {"ATOM"},
+    ),
+    ("GAS/VTHO Distribution for the 4th week of July, 2025", {"GAS", "VTHO"}),
+    (
+        "Temporary Suspension of AKT, XEC Digital Asset Withdrawals due to Wallet System Maintenance (Completed)",
+        {"AKT", "XEC"},
+    ),
+    ("네트워크 업그레이드에 따른 멀티버스엑스(EGLD) 입출금 일시 중단 안내 (완료)", {"EGLD"}),
+    (
+        "Temporary Suspension of TT, LTC Deposit/Withdrawal due to Wallet System Maintenance (07/31 23:00 ~)",
+        {"TT", "LTC"},
+    ),
+    (
+        "Temporary suspension of Deposit/Withdrawal service for STX due to Hardfork (07/29 12:00 ~)",
+        {"STX"},
+    ),
+    (
+        "Temporary Suspension of MED, KAVA Digital Asset Withdrawals due to Wallet System Maintenance (Completed)",
+        {"MED", "KAVA"},
+    ),
+    ("Market Support for Huma Finance(HUMA) (BTC, USDT Market)", {"HUMA"}),
+    ("Market Support for Maple Finance(SYRUP) (KRW, BTC, USDT Market)", {"SYRUP"}),
+    ("#있는 그대로의 나로 빛나는 법을 그려내는, 베리랜드에서 온 베리킴 작가 NFT 드롭스", set()),
+    ("네트워크 업그레이드에 따른 앱토스(APT) 입출금 일시 중단 안내 (완료)", {"APT"}),
+    (
+        "Temporary suspension of Withdrawal service for ZEN due to halt of Horizen Network",
+        {"ZEN"},
+    ),
+    ("Notice on Termination of Trading Support for Quiztok(QTCON) (8/25 15:00)", {"QTCON"}),
+    # listings whose symbol is not in the dictionary while AI and OP are
+    ("Market Support for Story AI(STORYAI) (KRW, BTC, USDT Market)", {"STORYAI"}),
+    ("Market Support for OP Labs Token(OPL) (KRW, BTC, USDT Market)", {"OPL"}),
+    (
+        "Guide to phishing text scam - Type of scam using the pretext of notifying users about the disposal of remaining digital assets in long-term inactive or dormant accounts",
+        set(),
+    ),
+    ("Precautions on Incorrect Deposits of Digital Assets", set()),
+    ("Warning and Risks on Digital Asset Trading", set()),
+    ("Cautionary Notice for Investment Scams Using Fake Cryptocurrency Exchanges", set()),
+    ("Precautions for Deposits/withdrawals under the Travel Rule Implementation", set()),
+    (
+        "Warning about Investing in Algorithmic Stablecoins and Related Digital Assets (Updated)",
+        set(),
+    ),
+    (
+        "Restrictions and Precautions for Deposits/Withdrawals with Unreported VASPs According to Act on Reporting and Using Specified Financial Transaction Information (Added on 2025.03.21)",
+        set(),
+    ),
+]
@@ -0,0 +1,131 @@
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional, Tuple
+
+from loguru import logger
+from prometheus_client import Counter, Gauge, Histogram
+
+SENDER_TABLE_SIZE = int(os.environ.get("SENDER_TABLE_SIZE", 64))
+SENDER_OFFSET_WINDOW = int(os.environ.get("SENDER_OFFSET_WINDOW", 32))
+STALE_AFTER_MS = int(os.environ.get("STALE_AFTER_MS", 5000))
+# label for senders past SENDER_TABLE_SIZE, keeps spoofed addresses from blowing up metrics
+OTHER_SENDERS = "other"
+
+SENDER_LAG = Histogram(
+    "relay_sender_lag_seconds",
+    "Arrival time minus announce release time, by sender",
+    ["sender"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 3, 4, 5, 7.5, 10, 30, 60, 300),
+)
+SENDER_BEHIND = Histogram(
+    "relay_sender_behind_seconds",
+    "Delay of a sender's copy behind the first arrival of the same announce",
+    ["sender"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+SENDER_OFFSET = Gauge(
+    "relay_sender_clock_offset_seconds",
+    "Lowest lag of the recent announces of a sender, estimates its offset to the release clock",
+    ["sender"],
+)
+SENDER_WIN_RATIO = Gauge(
+    "relay_sender_win_ratio", "Share of announces a sender delivered first", ["sender"]
+)
+SENDER_STALE = Counter(
+    "relay_sender_stale_total", "Announces dropped as stale, by sender", ["sender"]
+)
+
+
+@dataclass(slots=True)
+class SenderStats:
+    sender: str
+    wins: int = 0
+    duplicates: int = 0
+    stale: int = 0
+    samples: int = 0
+    # (sample number, lag ms) ascending by lag, the front is the window minimum
+    lag_floor: Deque[Tuple[int, int]] = field(default_factory=deque)
+    drifting: bool = False
+    # labelled metric children, labels() lookups cost more than the rest of arrived()
+    lag: object = field(init=False)
+    behind: object = field(init=False)
+    offset: object = field(init=False)
+    win_ratio_gauge: object = field(init=False)
+
+    def __post_init__(self):
+        self.lag = SENDER_LAG.labels(self.sender)
+        self.behind = SENDER_BEHIND.labels(self.sender)
+        self.offset = SENDER_OFFSET.labels(self.sender)
+        self.win_ratio_gauge = SENDER_WIN_RATIO.labels(self.sender)
+
+    @property
+    def offset_ms(self) -> Optional[int]:
+        return self.lag_floor[0][1] if self.lag_floor else None
+
+    @property
+    def win_ratio(self) -> float:
+        total = self.wins + self.duplicates
+        return self.wins / total if total else 0.0
+
+    def observe_lag(self, lag_ms: int, window: int):
+        self.samples += 1
+        while self.lag_floor and self.lag_floor[-1][1] >= lag_ms:
+            self.lag_floor.pop()
+        self.lag_floor.append((self.samples, lag_ms))
+        while self.lag_floor[0][0] <= self.samples - window:
+            self.lag_floor.popleft()
+
+
+class SenderTable:
+    """Per sending poller arrival statistics.
+
+    Announce timestamps are the exchange release time, not the poller's clock,
+    so the clock offset is estimated as the lowest lag over the last
+    SENDER_OFFSET_WINDOW announces: queueing and polling delay only ever add
+    to it, what is left is skew between the release clock and ours.
+    """
+
+    def __init__(self, max_senders: int = SENDER_TABLE_SIZE, window: int = SENDER_OFFSET_WINDOW):
+        self.max_senders = max_senders
+        self.window = window
+        self.senders: Dict[str, SenderStats] = {}
+
+    def label(self, sender: str) -> str:
+        if sender in self.senders or len(self.senders) < self.max_senders:
+            return sender
+        return OTHER_SENDERS
+
+    def stats(self, sender: str) -> SenderStats:
+        stats = self.senders.get(sender)
+        if stats is None:
+            stats = self.senders[sender] = SenderStats(sender)
+        return stats
+
+    def arrived(self, sender: str, lag_ms: int, behind_ns: Optional[int] = None):
+        """Records an announce, `behind_ns` is set for copies of an earlier arrival"""
+        sender = self.label(sender)
+        stats = self.stats(sender)
+        if behind_ns is None:
+            stats.wins += 1
+        else:
+            stats.duplicates += 1
+            stats.behind.observe(behind_ns / 1e9)
+        stats.win_ratio_gauge.set(stats.win_ratio)
+        stats.lag.observe(max(lag_ms, 0) / 1000)
+        stats.observe_lag(lag_ms, self.window)
+        offset_ms = stats.offset_ms
+        stats.offset.set(offset_ms / 1000)
+        # announces from the future (release clock ahead of ours) are never stale
+        drifting = offset_ms > STALE_AFTER_MS / 2
+        if drifting and not stats.drifting:
+            logger.warning(
+                f"Announces from {sender} lag at least {offset_ms}ms, "
+                f"close to the {STALE_AFTER_MS}ms staleness limit"
+            )
+        stats.drifting = drifting
+
+    def stale(self, sender: str):
+        sender = self.label(sender)
+        self.stats(sender).stale += 1
+        SENDER_STALE.labels(sender).inc()
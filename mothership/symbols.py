@@ -0,0 +1,209 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.11"
+# dependencies = ["loguru"]
+# ///
+"""Exchange symbol dictionary for announce titles.
+
+    ./symbols.py --update     refresh symbols.txt from the Binance and Upbit APIs
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import urllib.request
+from collections import OrderedDict, deque
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+from loguru import logger
+
+SYMBOLS_PATH = os.environ.get(
+    "SYMBOLS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "symbols.txt")
+)
+SYMBOLS_RELOAD_INTERVAL = float(os.environ.get("SYMBOLS_RELOAD_INTERVAL", 30))
+SYMBOLS_CACHE_SIZE = int(os.environ.get("SYMBOLS_CACHE_SIZE", 1024))
+
+# quote and base currencies every other title mentions, never the subject of an announce
+TOKENS_BLACKLIST = frozenset(
+    {"BNB", "USD", "COIN", "FD", "USDC", "USDT", "BTC", "ETH", "SOL", "KRW", "LISTING", "UPBIT"}
+)
+# "Market Support for Story AI(STORYAI)", the subject of an announce, known to the dictionary or not
+PARENTHESIZED_SYMBOL = re.compile(r"\(([^()\s,]{1,15})\)")
+SYMBOL_SHAPE = re.compile(r"[A-Z0-9]{2,15}")
+WORD_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789")
+
+BINANCE_EXCHANGE_INFO = "https://api.binance.com/api/v3/exchangeInfo"
+UPBIT_MARKETS = "https://api.upbit.com/v1/market/all"
+
+
+class SymbolAutomaton:
+    """Aho-Corasick automaton over a set of symbols.
+
+    find() walks the title once and reports every symbol that stands as a
+    whole word, i.e. is not glued to other ASCII letters or digits, so
+    "AR" never matches inside "SAHARA".
+    """
+
+    def __init__(self, symbols: Iterable[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        # symbols ending in a state, including the ones reached via fail links
+        self.output: List[Tuple[str, ...]] = [()]
+        for symbol in symbols:
+            self.add(symbol)
+        self.link()
+
+    def add(self, symbol: str):
+        state = 0
+        for char in symbol:
+            following = self.goto[state].get(char)
+            if following is None:
+                following = len(self.goto)
+                self.goto[state][char] = following
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(())
+            state = following
+        self.output[state] += (symbol,)
+
+    def link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self.goto[state].items():
+                queue.append(following)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[following] = self.goto[fallback].get(char, 0)
+                self.output[following] += self.output[self.fail[following]]
+
+    def find(self, text: str) -> List[Tuple[str, int, int]]:
+        """(symbol, start, end) of every whole word symbol in text"""
+        goto, fail, output = self.goto, self.fail, self.output
+        found = []
+        state = 0
+        length = len(text)
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not output[state]:
+                continue
+            end = index + 1
+            if end < length and text[end] in WORD_CHARS:
+                continue
+            for symbol in output[state]:
+                start = end - len(symbol)
+                if start == 0 or text[start - 1] not in WORD_CHARS:
+                    found.append((symbol, start, end))
+        return found
+
+
+class SymbolDictionary:
+    """Recognizes exchange symbols in announce titles.
+
+    Backed by a plain text file, one symbol per line, which is reloaded when
+    it changes. Symbols in parentheses right after a name are the subject of
+    the announce whether the dictionary knows them or not, a fresh listing
+    is not in it yet. When there are any the rest of the title ("Story
+    AI(STORYAI)", "Airdrop for MUBARAK holders") is ignored; the dictionary
+    only admits subjects not shaped like a symbol and finds the tokens of
+    titles without one. Titles repeat a lot across pollers and notices,
+    results are kept in an LRU cache.
+    """
+
+    def __init__(self, path: str = SYMBOLS_PATH, cache_size: int = SYMBOLS_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self.cache: OrderedDict[str, FrozenSet[str]] = OrderedDict()
+        self.mtime_ns = 0
+        self.symbols: FrozenSet[str] = frozenset()
+        self.automaton = SymbolAutomaton(())
+        self.reload()
+
+    def reload(self) -> bool:
+        """Rebuilds the automaton if the file changed, returns True if it did"""
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            if self.mtime_ns == 0:
+                logger.warning(f"No symbol dictionary at {self.path}, using the token regex")
+                self.mtime_ns = -1
+            return False
+        if mtime_ns == self.mtime_ns:
+            return False
+        with open(self.path) as f:
+            symbols = frozenset(
+                line.split("#")[0].strip().upper() for line in f if line.split("#")[0].strip()
+            )
+        # build first and swap after, lookups never see a half built automaton
+        automaton = SymbolAutomaton(symbols - TOKENS_BLACKLIST)
+        self.symbols, self.automaton, self.mtime_ns = symbols, automaton, mtime_ns
+        self.cache.clear()
+        logger.info(f"Loaded {len(symbols)} symbols from {self.path}")
+        return True
+
+    async def reload_periodically(self, interval: float = SYMBOLS_RELOAD_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.reload()
+            except Exception:
+                logger.exception(f"Failed to reload symbols from {self.path}")
+
+    def tokens(self, title: str) -> FrozenSet[str]:
+        tokens = self.cache.get(title)
+        if tokens is not None:
+            self.cache.move_to_end(title)
+            return tokens
+        tokens = self.match(title)
+        self.cache[title] = tokens
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return tokens
+
+    def match(self, title: str) -> FrozenSet[str]:
+        subjects = frozenset(
+            symbol
+            for symbol in PARENTHESIZED_SYMBOL.findall(title)
+            if symbol in self.symbols
+            or (SYMBOL_SHAPE.fullmatch(symbol) is not None and not symbol.isdigit())
+        ) - TOKENS_BLACKLIST
+        if subjects:
+            return subjects
+        return frozenset(symbol for symbol, _, _ in self.automaton.find(title))
+
+
+def fetch_json(url: str):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.load(response)
+
+
+def fetch_symbols() -> FrozenSet[str]:
+    """Base assets traded on Binance and Upbit"""
+    symbols = {market["baseAsset"] for market in fetch_json(BINANCE_EXCHANGE_INFO)["symbols"]}
+    symbols.update(market["market"].split("-")[1] for market in fetch_json(UPBIT_MARKETS))
+    return frozenset(symbol.upper() for symbol in symbols if symbol.isascii())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update", action="store_true", help="refresh the dictionary file")
+    parser.add_argument("--path", default=SYMBOLS_PATH)
+    parser.add_argument("titles", nargs="*", help="print the symbols found in these titles")
+    args = parser.parse_args()
+
+    if args.update:
+        known = SymbolDictionary(args.path).symbols
+        symbols = known | fetch_symbols()
+        # write next to it and rename, a reloading relay never reads a partial file
+        with open(f"{args.path}.tmp", "w") as f:
+            f.write("# exchange symbols, one per line, reloaded by the relay when changed\n")
+            f.writelines(f"{symbol}\n" for symbol in sorted(symbols))
+        os.replace(f"{args.path}.tmp", args.path)
+        print(f"{len(symbols)} symbols, {len(symbols - known)} new")
+    dictionary = SymbolDictionary(args.path)
+    for title in args.titles:
+        print(sorted(dictionary.tokens(title)), title)
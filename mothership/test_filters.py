@@ -0,0 +1,113 @@
+import time
+
+import filters
+from all_pb2 import Announcement
+from filters import FILTER_MAX_SIZE, FILTER_TS_PAST_MS, SIGNATURE_SIZE, SIGNATURE_TAG, DatagramFilter, sign
+
+KEY = b"secret"
+SOURCE = "10.0.0.1"
+
+
+def datagram(title="Binance Will List Sahara AI (SAHARA)", ts=0) -> bytes:
+    return Announcement(
+        ts=ts or int(time.time()), catalog=48, title=title, tokens=["SAHARA"]
+    ).SerializeToString()
+
+
+def reject(datagram_filter, data: bytes, source: str = SOURCE):
+    """Both stages in the order the relay runs them"""
+    reason = datagram_filter.reject_reason(data, source)
+    if reason is not None:
+        return reason
+    message = Announcement.FromString(data)
+    return datagram_filter.reject_message_reason(data, message, source, int(time.time() * 1000))
+
+
+def test_signed_datagram_passes():
+    datagram_filter = DatagramFilter(signing_keys="old,secret")
+    assert reject(datagram_filter, sign(datagram(), KEY)) is None
+
+
+def test_size_is_checked_first():
+    datagram_filter = DatagramFilter(signing_keys="secret")
+    assert datagram_filter.reject_reason(b"x", SOURCE) == "size"
+    assert datagram_filter.reject_reason(b"x" * (FILTER_MAX_SIZE + 1), SOURCE) == "size"
+
+
+def test_signatures():
+    datagram_filter = DatagramFilter(signing_keys="secret")
+    assert reject(datagram_filter, datagram()) == "unsigned"
+    assert reject(datagram_filter, sign(datagram(), b"wrong")) == "bad_signature"
+    tampered = bytearray(sign(datagram(), KEY))
+    tampered[4] ^= 1
+    assert reject(datagram_filter, bytes(tampered)) == "bad_signature"
+    # a signature field that is not the last one signed nothing after it
+    assert reject(datagram_filter, sign(datagram(), KEY) + b"\x20\x01") == "bad_signature"
+
+
+def test_signature_tag_in_the_title(monkeypatch):
+    monkeypatch.setattr(filters, "FILTER_ALLOW_UNSIGNED", True)
+    datagram_filter = DatagramFilter(signing_keys="secret")
+    data = Announcement(
+        ts=int(time.time()),
+        catalog=48,
+        title="Binance Will Add Foo (FOO) to Earn, Phase 2 rewards start on June 10, 2025",
+        call_to_action=True,
+    ).SerializeToString()
+    # "2 " of the title sits where a signature field would start
+    assert data[-SIGNATURE_SIZE:].startswith(SIGNATURE_TAG)
+    assert reject(datagram_filter, data) is None
+    assert reject(datagram_filter, sign(data, KEY)) is None
+
+
+def test_without_keys_unsigned_datagrams_pass():
+    assert reject(DatagramFilter(signing_keys=""), datagram()) is None
+
+
+def test_rate_limit_per_source():
+    # a token per 1000 s, nothing refills while the test runs
+    datagram_filter = DatagramFilter(signing_keys="", rate=0.001, burst=2)
+    data = datagram()
+    assert reject(datagram_filter, data) is None
+    assert reject(datagram_filter, data) is None
+    assert reject(datagram_filter, data) == "rate_limited"
+    # other sources have their own bucket
+    assert reject(datagram_filter, data, "10.0.0.2") is None
+
+
+def test_bucket_refill():
+    datagram_filter = DatagramFilter(signing_keys="", rate=1, burst=2)
+    assert datagram_filter.take(SOURCE, 0)
+    assert datagram_filter.take(SOURCE, 0)
+    assert not datagram_filter.take(SOURCE, 0)
+    # refilled at one token per second
+    assert not datagram_filter.take(SOURCE, 500_000_000)
+    assert datagram_filter.take(SOURCE, 1_000_000_000)
+
+
+def test_spoofed_junk_does_not_use_up_a_signed_source():
+    datagram_filter = DatagramFilter(signing_keys="secret", rate=0.001, burst=2)
+    for _ in range(10):
+        assert reject(datagram_filter, sign(datagram(), b"wrong")) == "bad_signature"
+        assert reject(datagram_filter, datagram()) == "unsigned"
+    assert reject(datagram_filter, sign(datagram(), KEY)) is None
+    assert reject(datagram_filter, sign(datagram(), KEY)) is None
+    # the source's own signed datagrams are still limited
+    assert reject(datagram_filter, sign(datagram(), KEY)) == "rate_limited"
+
+
+def test_source_table_is_bounded():
+    datagram_filter = DatagramFilter(signing_keys="", rate=1, burst=1, max_sources=2)
+    for source in ("10.0.0.1", "10.0.0.2", "10.0.0.3"):
+        reject(datagram_filter, datagram(), source)
+    assert list(datagram_filter.buckets) == ["10.0.0.2", "10.0.0.3"]
+
+
+def test_message_shape_and_window():
+    datagram_filter = DatagramFilter(signing_keys="")
+    now_ms = int(time.time() * 1000)
+    assert reject(datagram_filter, datagram()) is None
+    untitled = Announcement(ts=now_ms // 1000, catalog=48, tokens=["SAHARA", "AI"] * 4)
+    assert reject(datagram_filter, untitled.SerializeToString()) == "shape"
+    old = datagram(ts=(now_ms - FILTER_TS_PAST_MS) // 1000 - 1)
+    assert reject(datagram_filter, old) == "ts_window"
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from outbox import HEADER, RECORD, Outbox
+
+SIZE = 4096
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "outbox.bin")
+
+
+def frames(outbox):
+    return [frame for _, frame in outbox.unacked()]
+
+
+def test_unacked_frames_survive_a_restart(path):
+    outbox = Outbox(path, SIZE)
+    first = outbox.append("first")
+    outbox.append(b"\x0a\x01second")
+    outbox.append("third")
+    outbox.ack(first)
+    outbox.close()
+
+    reopened = Outbox(path, SIZE)
+    # framing is kept per record
+    assert frames(reopened) == [b"\x0a\x01second", "third"]
+
+
+def test_acked_log_is_reset(path):
+    outbox = Outbox(path, SIZE)
+    sequences = [outbox.append(f"frame {i}") for i in range(3)]
+    for sequence in sequences:
+        outbox.ack(sequence)
+    assert outbox.ack_offset == outbox.write_offset == HEADER.size
+    outbox.close()
+    assert frames(Outbox(path, SIZE)) == []
+
+
+def test_torn_record_is_dropped_on_recovery(path):
+    outbox = Outbox(path, SIZE)
+    outbox.append("complete")
+    outbox.append("torn")
+    # a crash between the write offset update and the payload copy
+    outbox.write_offset -= 2
+    outbox.write_header()
+    outbox.close()
+    assert frames(Outbox(path, SIZE)) == ["complete"]
+
+
+def test_released_frames_are_replayed(path):
+    outbox = Outbox(path, SIZE)
+    sequence = outbox.append("frame")
+    # in flight, the live send owns it
+    assert outbox.unacked() == []
+    outbox.release(sequence)
+    assert outbox.unacked() == [(sequence, "frame")]
+
+
+def test_compaction_keeps_unacked_frames(path):
+    outbox = Outbox(path, SIZE)
+    payload = "x" * 1000
+    sequences = [outbox.append(payload) for _ in range(4)]
+    outbox.ack(sequences[0])
+    outbox.ack(sequences[1])
+    # only fits once the acknowledged records are moved out of the way
+    fifth = outbox.append("y" * 1000)
+    assert outbox.ack_offset == HEADER.size
+    for sequence in (*sequences[2:], fifth):
+        outbox.release(sequence)
+    assert outbox.unacked() == [(sequences[2], payload), (sequences[3], payload), (fifth, "y" * 1000)]
+    outbox.close()
+    assert frames(Outbox(path, SIZE)) == [payload, payload, "y" * 1000]
+
+
+def test_full_outbox_drops_the_oldest_frames(path):
+    outbox = Outbox(path, SIZE)
+    payload = "x" * 1000
+    sequences = [outbox.append(payload) for _ in range(4)]
+    fifth = outbox.append(payload)
+    assert sequences[0] not in outbox.pending
+    assert list(outbox.pending) == [*sequences[1:], fifth]
+
+
+def test_oversize_frame_is_refused_without_dropping(path):
+    outbox = Outbox(path, SIZE)
+    sequence = outbox.append("kept")
+    with pytest.raises(ValueError):
+        outbox.append("x" * (SIZE - HEADER.size - RECORD.size + 1))
+    outbox.release(sequence)
+    assert frames(outbox) == ["kept"]
+
+
+def test_stale_frames_are_not_replayed(path):
+    outbox = Outbox(path, SIZE)
+    stale = outbox.append("stale", announced_ns=time.time_ns() - 60 * 10**9)
+    fresh = outbox.append("fresh")
+    for sequence in (stale, fresh):
+        outbox.release(sequence)
+    assert outbox.unacked(max_age=30) == [(fresh, "fresh")]
+    assert stale not in outbox.pending
@@ -0,0 +1,144 @@
+import random
+from collections import Counter
+
+import pytest
+
+from proxy_scoring import (
+    SCORE_DEFAULT_LATENCY,
+    SCORE_MIN_LATENCY,
+    SCORE_REFRESH_INTERVAL,
+    AliasTable,
+    ProxyScore,
+    WeightedPool,
+)
+
+
+@pytest.fixture(autouse=True)
+def seeded():
+    random.seed(7)
+
+
+def scored(latency: float, success: float = 1.0) -> ProxyScore:
+    return ProxyScore(latency=latency, success=success, checks=1, successes=1)
+
+
+def test_first_latency_replaces_the_default():
+    score = ProxyScore()
+    assert score.latency == SCORE_DEFAULT_LATENCY
+    score.record(True, 0.2)
+    assert score.latency == 0.2
+    score.record(True, 1.2)
+    assert score.latency == pytest.approx(0.5)
+
+
+def test_failures_lower_success_but_keep_latency():
+    score = scored(0.2)
+    score.record(False)
+    assert score.latency == 0.2
+    assert score.success == pytest.approx(0.7)
+    assert score.checks == 2
+
+
+def test_weight_floors_latency():
+    assert scored(0.001).weight == scored(SCORE_MIN_LATENCY).weight
+
+
+def test_draw_follows_the_weights():
+    table = AliasTable(["a", "b", "c"], [1, 2, 7])
+    draws = Counter(table.draw() for _ in range(100_000))
+    for item, share in (("a", 0.1), ("b", 0.2), ("c", 0.7)):
+        assert draws[item] / 100_000 == pytest.approx(share, abs=0.01)
+
+
+def test_zero_weights_draw_uniformly():
+    table = AliasTable(["a", "b"], [0, 0])
+    draws = Counter(table.draw() for _ in range(10_000))
+    assert draws["a"] / 10_000 == pytest.approx(0.5, abs=0.03)
+
+
+@pytest.mark.parametrize("count", [1, 3, 7, 10, 20])
+def test_sample_is_distinct(count):
+    # up to half redraws duplicates, beyond that a weighted shuffle
+    items = [str(i) for i in range(10)]
+    table = AliasTable(items, [i + 1 for i in range(10)])
+    picked = table.sample(count)
+    assert len(picked) == len(set(picked)) == min(count, 10)
+    assert set(picked) <= set(items)
+
+
+def test_sample_prefers_heavy_items():
+    table = AliasTable(["light", "heavy"], [1, 99])
+    firsts = Counter(table.sample(2)[0] for _ in range(2_000))
+    assert firsts["heavy"] > 1_900
+
+
+def test_shuffle_puts_zero_weights_last():
+    table = AliasTable(["zero", "a", "b"], [0, 1, 1])
+    assert all(table.shuffle()[-1] == "zero" for _ in range(100))
+
+
+def test_sample_nothing():
+    assert AliasTable([], []).sample(3) == []
+    assert AliasTable(["a"], [1]).sample(0) == []
+
+
+def test_pool_prefix_and_max_latency():
+    scores = {
+        "socks5://1.1.1.1:1080": scored(0.1),
+        "socks5://2.2.2.2:1080": scored(3.0),
+        "http://3.3.3.3:8080": scored(0.1),
+    }
+    pool = WeightedPool(list(scores), scores)
+    assert set(pool.sample(10, "socks5")) == {"socks5://1.1.1.1:1080", "socks5://2.2.2.2:1080"}
+    assert pool.sample(10, "socks5", max_latency=1.0) == ["socks5://1.1.1.1:1080"]
+    assert pool.sample(10, "socks4") == []
+    assert len(pool.sample(10)) == 3
+
+
+def test_pool_indexes_by_scheme():
+    proxies = ["socks4://1.1.1.1:1", "socks5://1.1.1.1:1", "socks5://2.2.2.2:1", "http://1.1.1.1:1", "1.1.1.1:1"]
+    pool = WeightedPool(proxies, {})
+    assert {scheme: len(entries) for scheme, entries in pool.schemes.items()} == {
+        "socks4": 1,
+        "socks5": 2,
+        "http": 1,
+        "": 1,
+    }
+    # a prefix can span schemes or narrow one down
+    assert set(pool.sampler("socks").items) == set(proxies[:3])
+    assert pool.sampler("socks5://2").items == ["socks5://2.2.2.2:1"]
+    assert pool.sampler("1.1").items == ["1.1.1.1:1"]
+    assert pool.sampler("socks") is pool.sampler("socks")
+
+
+def test_pool_body_and_etag():
+    proxies = ["socks5://1.1.1.1:1", "http://2.2.2.2:1"]
+    pool = WeightedPool(proxies, {})
+    assert pool.body == b"socks5://1.1.1.1:1\nhttp://2.2.2.2:1"
+    rebuilt = WeightedPool(list(proxies), {})
+    # a new version, but the same list keeps its ETag across snapshots and restarts
+    assert rebuilt.version > pool.version
+    assert rebuilt.etag == pool.etag
+    assert WeightedPool(proxies[:1], {}).etag != pool.etag
+
+
+def test_rescore_refreshes_samplers_at_most_every_interval():
+    scores = {"socks5://1.1.1.1:1": scored(1.0), "socks5://2.2.2.2:1": scored(1.0)}
+    pool = WeightedPool(list(scores), scores)
+    body, schemes = pool.body, pool.schemes
+    table = pool.sampler()
+    assert table.weights == [1.0, 1.0]
+    # recorded in place, the pool only learns that scores changed
+    scores["socks5://1.1.1.1:1"].record(True, 0.1)
+    pool.rescore()
+    assert pool.sampler() is table
+    pool.refreshed_at -= SCORE_REFRESH_INTERVAL
+    refreshed = pool.sampler()
+    assert refreshed is not table
+    assert refreshed.weights[0] > refreshed.weights[1]
+    assert not pool.stale
+    # the snapshot itself is kept
+    assert pool.body is body and pool.schemes is schemes
+    # nothing changed since, nothing is rebuilt
+    pool.refreshed_at -= SCORE_REFRESH_INTERVAL
+    assert pool.sampler() is refreshed
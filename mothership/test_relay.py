@@ -0,0 +1,131 @@
+import asyncio
+import json
+from dataclasses import asdict
+
+import pytest
+
+import relay
+import relay_pb2
+from routing import PRIORITY_DEFAULT, PRIORITY_LISTING
+from samples import ALL_ANNOUNCES, make_announcement
+
+TITLES = ALL_ANNOUNCES + [(48, 'Binance Will List "Quoted" Ünïcode USDⓈ (QTE)', True)]
+
+
+def new_announces(catalog, title, call_to_action, tokens, dry_run=False):
+    message = make_announcement(catalog, title, call_to_action, ts=1_700_000_000)
+    entry = relay.PageEntry(
+        title=message.title,
+        ts=message.ts,
+        tokens=tokens,
+        catalog_id=message.catalog,
+        cex=relay.PageEntryCEX.UPBIT.value,
+    )
+    return relay.NewAnnounces(relay.CLIENT_ID, [entry], dry_run=dry_run)
+
+
+@pytest.mark.parametrize("catalog, title, call_to_action", TITLES)
+@pytest.mark.parametrize("dry_run", [False, True])
+def test_json_frame_is_byte_identical(catalog, title, call_to_action, dry_run):
+    # consumers compare frames, the template must not drift from json.dumps(asdict())
+    message = make_announcement(catalog, title, call_to_action)
+    for tokens in (set(message.tokens), relay.parse_upbit_listing_tokens(title), set()):
+        announces = new_announces(catalog, title, call_to_action, tokens, dry_run)
+        assert announces.to_json_str() == relay.BaseMessage.to_json_str(announces)
+
+
+def test_trace_is_appended_to_the_json_frame():
+    announces = new_announces(48, "Binance Will List Sahara AI (SAHARA)", True, {"SAHARA"})
+    trace = relay.Trace("abc", 1, 2, 3, 4)
+    traced = json.loads(announces.to_json_str(trace))
+    assert traced.pop("trace") == asdict(trace)
+    assert traced == json.loads(announces.to_json_str())
+
+
+def test_reframe_round_trip():
+    announces = new_announces(777, "Market Support for Sahara AI(SAHARA)", False, {"SAHARA"}, True)
+    trace = relay.Trace("abc", 1, 2, 3, 4)
+    text = announces.to_json_str(trace)
+    binary = relay.reframe(text)
+    assert isinstance(binary, bytes)
+    message = relay_pb2.NewAnnounces.FromString(binary)
+    assert message.dry_run and message.trace.id == "abc"
+    assert list(message.entries[0].tokens) == ["SAHARA"]
+    assert relay.reframe(binary) == text
+
+
+def test_dedup_cache_reports_the_first_arrival():
+    cache = relay.DedupCache(ttl_seconds=1, max_entries=10)
+    assert cache.claim(b"a", "10.0.0.1", 100) is None
+    assert cache.claim(b"a", "10.0.0.2", 200) == (100, "10.0.0.1")
+    assert cache.claim(b"b", "10.0.0.2", 300) is None
+
+
+def test_dedup_cache_forgets_after_ttl():
+    cache = relay.DedupCache(ttl_seconds=1, max_entries=10)
+    cache.claim(b"a", "10.0.0.1", 0)
+    assert cache.claim(b"a", "10.0.0.2", 1_000_000_001) is None
+    assert cache.entries[b"a"] == (1_000_000_001, "10.0.0.2")
+
+
+def test_dedup_cache_is_bounded():
+    cache = relay.DedupCache(ttl_seconds=60, max_entries=2)
+    for i, fingerprint in enumerate([b"a", b"b", b"c"]):
+        cache.claim(fingerprint, "10.0.0.1", i)
+    assert list(cache.entries) == [b"b", b"c"]
+
+
+def test_shared_dedup_cache_matches_the_local_one():
+    cache = relay.SharedDedupCache(ttl_seconds=1, max_entries=64)
+    fingerprint = relay.announce_fingerprint(make_announcement(48, "Binance Will List X (X)", True))
+    assert cache.claim(fingerprint, "10.0.0.1", 100) is None
+    assert cache.claim(fingerprint, "10.0.0.2", 200) == (100, "10.0.0.1")
+    assert cache.claim(fingerprint, "10.0.0.2", 1_000_000_101) is None
+
+
+def test_fingerprint_ignores_whitespace_and_case():
+    first = make_announcement(48, "Binance Will List  Sahara AI (SAHARA)", True, ts=1)
+    second = make_announcement(48, "binance will list sahara ai (SAHARA) ", True, ts=1)
+    assert relay.announce_fingerprint(first) == relay.announce_fingerprint(second)
+
+
+def queued(title, priority):
+    return relay.Forward(new_announces(48, title, True, set()), priority=priority)
+
+
+def drain(queue):
+    async def get_all():
+        return [(await queue.get()).announces.entries[0].title for _ in range(queue.size)]
+
+    return asyncio.run(get_all())
+
+
+def test_forward_queue_is_fifo_within_a_priority_and_listings_first():
+    queue = relay.ForwardQueue(maxsize=10)
+    for title, priority in [
+        ("noise 1", PRIORITY_DEFAULT),
+        ("listing 1", PRIORITY_LISTING),
+        ("noise 2", PRIORITY_DEFAULT),
+        ("listing 2", PRIORITY_LISTING),
+    ]:
+        assert queue.put(queued(title, priority))
+    assert drain(queue) == ["listing 1", "listing 2", "noise 1", "noise 2"]
+
+
+def test_full_forward_queue_drops_the_newest_noise_for_a_listing():
+    queue = relay.ForwardQueue(maxsize=3)
+    assert queue.put(queued("listing 1", PRIORITY_LISTING))
+    assert queue.put(queued("noise 1", PRIORITY_DEFAULT))
+    assert queue.put(queued("noise 2", PRIORITY_DEFAULT))
+    assert queue.put(queued("listing 2", PRIORITY_LISTING))
+    # noise never pushes anything out
+    assert not queue.put(queued("noise 3", PRIORITY_DEFAULT))
+    assert drain(queue) == ["listing 1", "listing 2", "noise 1"]
+
+
+def test_full_forward_queue_of_listings_drops_the_new_one():
+    queue = relay.ForwardQueue(maxsize=2)
+    assert queue.put(queued("listing 1", PRIORITY_LISTING))
+    assert queue.put(queued("listing 2", PRIORITY_LISTING))
+    assert not queue.put(queued("listing 3", PRIORITY_LISTING))
+    assert drain(queue) == ["listing 1", "listing 2"]
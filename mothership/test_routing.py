@@ -0,0 +1,104 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from routing import (
+    DEFAULT_ROUTES,
+    FORWARD_ALWAYS,
+    PRIORITY_LISTING,
+    Route,
+    RoutingTable,
+)
+
+
+def write_routes(path, config):
+    with open(path, "w") as f:
+        f.write(config if isinstance(config, str) else json.dumps(config))
+    # mtime granularity must not hide a rewrite
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def routes_path(tmp_path):
+    path = str(tmp_path / "routes.json")
+    write_routes(path, {"routes": {"1": {"forward": "always", "catalog_id": 48, "priority": "listing"}}})
+    return path
+
+
+def test_compile():
+    route = Route.compile({"cex": "upbit", "forward": "always", "catalog_id": 48, "priority": "listing"})
+    assert route == Route(cex="upbit", forward=FORWARD_ALWAYS, catalog_id=48, priority=PRIORITY_LISTING)
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        {"forward": "sometimes"},
+        {"tokens": "body"},
+        {"priority": "urgent"},
+        {"priority": 7},
+        {"catalog": 48},
+        {"catalog_id": "48"},
+        {"catalog_id": True},
+        {"dry_run": "no"},
+        {"cex": None},
+        "always",
+    ],
+)
+def test_compile_rejects(spec):
+    with pytest.raises((ValueError, KeyError, TypeError)):
+        Route.compile(spec)
+
+
+def test_built_in_routes_without_a_file(tmp_path):
+    table = RoutingTable(str(tmp_path / "missing.json"))
+    assert sorted(table.routes) == sorted(int(catalog) for catalog in DEFAULT_ROUTES["routes"])
+
+
+def test_lookup_and_label(routes_path):
+    table = RoutingTable(routes_path)
+    assert table.route(1).catalog_id == 48
+    assert table.route(2) is table.default
+    assert table.label(1) == "1"
+    assert table.label(123456) == "other"
+
+
+@pytest.mark.parametrize(
+    "config",
+    ["not json", "[]", {"routes": []}, {"routes": {"1": {"catalog_id": "x"}}}, {"routes": {"x": {}}}],
+)
+def test_bad_file_keeps_the_table(routes_path, config):
+    table = RoutingTable(routes_path)
+    write_routes(routes_path, config)
+    assert not table.reload()
+    assert table.route(1).catalog_id == 48
+
+
+def test_changed_file_is_reloaded(routes_path):
+    table = RoutingTable(routes_path)
+    write_routes(routes_path, {"routes": {"2": {"forward": "never"}}})
+    assert table.reload()
+    assert sorted(table.routes) == [2]
+
+
+def test_reload_failure_keeps_reloading(routes_path, monkeypatch):
+    table = RoutingTable(routes_path)
+    calls = []
+
+    def reload():
+        calls.append(1)
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(table, "reload", reload)
+
+    async def run():
+        task = asyncio.create_task(table.reload_periodically(0))
+        while len(calls) < 3:
+            await asyncio.sleep(0)
+        task.cancel()
+
+    asyncio.run(run())
+    assert table.route(1).catalog_id == 48
@@ -0,0 +1,54 @@
+from senders import OTHER_SENDERS, STALE_AFTER_MS, SenderTable
+
+SENDER = "10.0.0.1"
+
+
+def test_offset_is_the_lowest_lag_of_the_window():
+    table = SenderTable(window=3)
+    offsets = []
+    for lag_ms in [500, 200, 300, 400, 450, 100]:
+        table.arrived(SENDER, lag_ms)
+        offsets.append(table.senders[SENDER].offset_ms)
+    # 200 leaves the window with the fifth announce
+    assert offsets == [500, 200, 200, 200, 300, 100]
+
+
+def test_lag_floor_stays_within_the_window():
+    table = SenderTable(window=4)
+    for lag_ms in range(100, 0, -1):
+        table.arrived(SENDER, lag_ms)
+    for lag_ms in range(1, 100):
+        table.arrived(SENDER, lag_ms)
+    stats = table.senders[SENDER]
+    assert len(stats.lag_floor) <= 4
+    assert stats.offset_ms == 96
+
+
+def test_win_ratio():
+    table = SenderTable()
+    table.arrived(SENDER, 100)
+    table.arrived(SENDER, 100, behind_ns=5_000_000)
+    table.arrived(SENDER, 100, behind_ns=5_000_000)
+    table.arrived(SENDER, 100)
+    stats = table.senders[SENDER]
+    assert (stats.wins, stats.duplicates, stats.win_ratio) == (2, 2, 0.5)
+
+
+def test_drifting_sender_is_flagged_until_it_recovers():
+    table = SenderTable(window=2)
+    table.arrived(SENDER, STALE_AFTER_MS)
+    assert table.senders[SENDER].drifting
+    table.arrived(SENDER, 100)
+    assert not table.senders[SENDER].drifting
+
+
+def test_senders_past_the_table_share_a_label():
+    table = SenderTable(max_senders=2)
+    for sender in ("10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4"):
+        table.arrived(sender, 100)
+    table.stale("10.0.0.5")
+    assert table.label("10.0.0.2") == "10.0.0.2"
+    assert table.label("10.0.0.9") == OTHER_SENDERS
+    assert set(table.senders) == {"10.0.0.1", "10.0.0.2", OTHER_SENDERS}
+    assert table.senders[OTHER_SENDERS].wins == 2
+    assert table.senders[OTHER_SENDERS].stale == 1
@@ -0,0 +1,57 @@
+import pytest
+
+from symbols import SymbolAutomaton, SymbolDictionary
+
+
+@pytest.fixture
+def dictionary(tmp_path):
+    path = tmp_path / "symbols.txt"
+    path.write_text("# test symbols\nAI\nAR\nOP\nAKT\nXEC\nbtc\nKRW\nUSDT  # quote\n")
+    return SymbolDictionary(str(path))
+
+
+@pytest.mark.parametrize(
+    "title, tokens",
+    [
+        # the subject in parentheses wins over known words of its name
+        ("Market Support for Story AI(STORYAI) (KRW, BTC, USDT Market)", {"STORYAI"}),
+        ("Market Support for OP Labs Token(OPL) (BTC, USDT Market)", {"OPL"}),
+        ("Market Support for Akash Network(AKT)", {"AKT"}),
+        ("Binance Will List Sahara AI (SAHARA) with Seed Tag Applied", {"SAHARA"}),
+        # quote currencies are never the subject
+        ("Market Support for (BTC)", set()),
+        # parenthesized text not shaped like a symbol leaves the title to the dictionary
+        (
+            "Temporary Suspension of AKT, XEC Digital Asset Withdrawals (Completed)",
+            {"AKT", "XEC"},
+        ),
+        ("Notice on Termination of Trading Support (8/28 15:00)", set()),
+        ("Phase 2 Airdrop (2025)", set()),
+        # whole words only
+        ("Airdrop for SAHARA holders", set()),
+        ("Airdrop for AR holders", {"AR"}),
+        ("OPEN trading for AIRDROP campaign", set()),
+        ("BTC and KRW markets for AI", {"AI"}),
+    ],
+)
+def test_match(dictionary, title, tokens):
+    assert dictionary.match(title) == tokens
+
+
+def test_symbols_are_normalized(dictionary):
+    assert {"BTC", "USDT", "AI"} <= dictionary.symbols
+
+
+def test_automaton_reports_overlapping_whole_words():
+    automaton = SymbolAutomaton(["AR", "SAHARA", "HAR"])
+    assert automaton.find("SAHARA AR-HAR") == [("SAHARA", 0, 6), ("AR", 7, 9), ("HAR", 10, 13)]
+
+
+def test_reload_picks_up_new_symbols(dictionary):
+    assert dictionary.tokens("Airdrop for SAHARA holders") == set()
+    with open(dictionary.path, "a") as f:
+        f.write("SAHARA\n")
+    dictionary.mtime_ns -= 1
+    assert dictionary.reload()
+    # cached results are dropped with the old table
+    assert dictionary.tokens("Airdrop for SAHARA holders") == {"SAHARA"}
@@ -0,0 +1,157 @@
+import asyncio
+import os
+import random
+import socket
+import time
+from typing import Awaitable, Callable, List, Optional, Set
+
+import websockets
+from loguru import logger
+
+WS_POOL_SIZE = int(os.environ.get("WS_POOL_SIZE", 2))
+WS_PING_INTERVAL = float(os.environ.get("WS_PING_INTERVAL", 5))
+WS_PING_TIMEOUT = float(os.environ.get("WS_PING_TIMEOUT", 5))
+WS_BACKOFF_MIN = float(os.environ.get("WS_BACKOFF_MIN", 0.1))
+WS_BACKOFF_MAX = float(os.environ.get("WS_BACKOFF_MAX", 10))
+WS_SEND_WAIT = float(os.environ.get("WS_SEND_WAIT", 2))
+
+
+def low_latency_options(
+    ping_interval: float = WS_PING_INTERVAL, ping_timeout: float = WS_PING_TIMEOUT
+) -> dict:
+    """websockets.connect options for small latency critical frames"""
+    return {
+        "compression": None,  # per-message deflate costs more than it saves on ~300 byte frames
+        "ping_interval": ping_interval,
+        "ping_timeout": ping_timeout,
+        "open_timeout": 5,
+        "close_timeout": 1,
+    }
+
+
+def set_nodelay(websocket):
+    """Disables Nagle so a frame leaves the box as soon as send() returns"""
+    sock = websocket.transport.get_extra_info("socket")
+    if sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class Uplink:
+    """Pool of pre-warmed WebSocket connections to a single server.
+
+    Every slot of the pool is owned by a background task which connects,
+    keeps the connection pinged and reconnects with exponential backoff.
+    The hot path only calls send() on an already open connection.
+    """
+
+    def __init__(
+        self,
+        uri: str,
+        pool_size: int = WS_POOL_SIZE,
+        options: Optional[dict] = None,
+        subprotocols: Optional[List[str]] = None,
+        binary_subprotocol: Optional[str] = None,
+        reframe: Optional[Callable] = None,
+    ):
+        self.uri = uri
+        self.pool_size = max(1, pool_size)
+        self.options = options or low_latency_options()
+        if subprotocols:
+            self.options["subprotocols"] = subprotocols
+        # what the server picked out of subprotocols, None if it ignored them.
+        # the latest connection's, frames are matched to their own connection in send()
+        self.subprotocol: Optional[str] = None
+        self.binary_subprotocol = binary_subprotocol
+        # converts a JSON frame to a binary one and back
+        self.reframe = reframe
+        self.connections: List = []
+        self.ready = asyncio.Event()
+        self.tasks: List[asyncio.Task] = []
+        self.next_connection = 0
+        self.last_send_ms = 0.0
+        # called for every new connection, e.g. to replay what could not be sent
+        self.on_connect: Optional[Callable[[], Awaitable]] = None
+        self.callbacks: Set[asyncio.Task] = set()
+
+    def start(self):
+        for slot in range(self.pool_size):
+            self.tasks.append(asyncio.create_task(self.keep_connected(slot)))
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks.clear()
+
+    async def keep_connected(self, slot: int):
+        backoff = WS_BACKOFF_MIN
+        while True:
+            started = time.perf_counter()
+            try:
+                websocket = await websockets.connect(self.uri, **self.options)
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                logger.warning(
+                    f"Uplink {slot} failed to connect to {self.uri}: {ex!r}, retry in {backoff:.1f}s"
+                )
+                await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+                backoff = min(backoff * 2, WS_BACKOFF_MAX)
+                continue
+            handshake_ms = (time.perf_counter() - started) * 1000
+            set_nodelay(websocket)
+            self.subprotocol = websocket.subprotocol
+            logger.info(
+                f"Uplink {slot} connected to {self.uri}, handshake took {handshake_ms:.2f}ms, subprotocol {self.subprotocol}"
+            )
+            backoff = WS_BACKOFF_MIN
+            self.connections.append(websocket)
+            self.ready.set()
+            if self.on_connect:
+                callback = asyncio.create_task(self.on_connect())
+                self.callbacks.add(callback)
+                callback.add_done_callback(self.callbacks.discard)
+            try:
+                # drain whatever the server sends back, otherwise a full receive
+                # queue stops reading and pongs are never seen
+                async for _ in websocket:
+                    pass
+            except websockets.ConnectionClosed:
+                pass
+            finally:
+                self.connections.remove(websocket)
+                if not self.connections:
+                    self.ready.clear()
+                await websocket.close()
+            logger.warning(f"Uplink {slot} disconnected from {self.uri}")
+
+    async def send(self, frame) -> bool:
+        """Sends a pre-built frame over a warm connection, returns False if none could take it.
+
+        A frame in the other framing than the connection negotiated, encoded
+        for an earlier connection or replayed from the outbox, is converted.
+        """
+        if not self.connections:
+            try:
+                await asyncio.wait_for(self.ready.wait(), WS_SEND_WAIT)
+            except asyncio.TimeoutError:
+                logger.error(f"No uplink connection to {self.uri} within {WS_SEND_WAIT}s")
+                return False
+        for _ in range(len(self.connections)):
+            if not self.connections:
+                break
+            websocket = self.connections[self.next_connection % len(self.connections)]
+            self.next_connection += 1
+            payload = frame
+            if self.reframe and isinstance(frame, bytes) != (
+                websocket.subprotocol == self.binary_subprotocol
+            ):
+                payload = self.reframe(frame)
+            started = time.perf_counter()
+            try:
+                await websocket.send(payload)
+            except websockets.ConnectionClosed:
+                continue
+            self.last_send_ms = (time.perf_counter() - started) * 1000
+            return True
+        return False